@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DrinkHub.settings')
 
 application = get_asgi_application()
+
+# The in-process name indexes are built before the first request
+from drinks.indexes import warmIndexes
+
+warmIndexes()
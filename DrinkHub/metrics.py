@@ -0,0 +1,220 @@
+import json
+import os
+import tempfile
+import time
+from bisect import bisect_left
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from .process import ProcessState
+from .queries import QueryCounter, wrapQueries
+
+# Upper bounds, in seconds, of the buckets of the duration histograms
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def getMetricsDirectory():
+    return getattr(settings, "METRICS_DIR", os.path.join(tempfile.gettempdir(), "drinkhub-metrics"))
+
+
+def isEnabled():
+    return getattr(settings, "METRICS_ENABLED", False)
+
+
+def makeKey(name, labels):
+    return (name, tuple(sorted((labels or {}).items())))
+
+
+# Aggregates the counters and histograms of this process in memory. Every process
+# writes its own file, at most once every METRICS_FLUSH_INTERVAL seconds, so
+# processes never wait on each other and the lock is only held to add a value.
+# The metrics endpoint adds up the files of all the processes. Nothing is recorded
+# unless METRICS_ENABLED is set, so tests and commands leave no files behind.
+class MetricsCollector(ProcessState):
+    def reset(self):
+        super().reset()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed = time.monotonic()
+
+    def increment(self, name, labels=None, value=1):
+        if not isEnabled():
+            return
+        key = makeKey(name, labels)
+        with self.lock:
+            self.checkProcess()
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.flushIfDue()
+
+    def observe(self, name, value, labels=None, buckets=DURATION_BUCKETS):
+        if not isEnabled():
+            return
+        key = makeKey(name, labels)
+        with self.lock:
+            self.checkProcess()
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "buckets": list(buckets),
+                    "counts": [0] * (len(buckets) + 1),
+                    "sum": 0.0,
+                }
+            histogram["counts"][bisect_left(buckets, value)] += 1
+            histogram["sum"] += value
+        self.flushIfDue()
+
+    def flushIfDue(self):
+        if time.monotonic() - self.flushed >= getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0):
+            self.flush()
+
+    # The file is replaced atomically, so readers never see a partial one
+    def flush(self):
+        with self.lock:
+            self.checkProcess()
+            self.flushed = time.monotonic()
+            data = {
+                "counters": [[name, labels, value] for (name, labels), value in self.counters.items()],
+                "histograms": [
+                    [name, labels, dict(histogram, counts=list(histogram["counts"]))]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+        if not data["counters"] and not data["histograms"]:
+            return
+
+        directory = getMetricsDirectory()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"metrics-{self.pid}.json")
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as file:
+            json.dump(data, file)
+        os.replace(file.name, path)
+
+
+metrics = MetricsCollector()
+
+
+def processExists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Adds up the metrics written by every running process. The files of processes
+# that exited are deleted, so restarted workers don't pile them up.
+def readMetrics():
+    counters = {}
+    histograms = {}
+    directory = getMetricsDirectory()
+    if not os.path.isdir(directory):
+        return counters, histograms
+
+    for filename in os.listdir(directory):
+        if not (filename.startswith("metrics-") and filename.endswith(".json")):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            pid = int(filename[len("metrics-"):-len(".json")])
+        except ValueError:
+            continue
+        if not processExists(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+
+        for name, labels, value in data["counters"]:
+            key = makeKey(name, dict(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, histogram in data["histograms"]:
+            key = makeKey(name, dict(labels))
+            total = histograms.setdefault(key, {
+                "buckets": histogram["buckets"],
+                "counts": [0] * len(histogram["counts"]),
+                "sum": 0.0,
+            })
+            total["counts"] = [a + b for a, b in zip(total["counts"], histogram["counts"])]
+            total["sum"] += histogram["sum"]
+    return counters, histograms
+
+
+def formatLabels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+# Writes the metrics in the Prometheus text exposition format
+def renderMetrics(counters, histograms):
+    lines = []
+    typed = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{formatLabels(labels)} {value}")
+
+    for (name, labels), histogram in sorted(histograms.items()):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        bounds = [str(bound) for bound in histogram["buckets"]] + ["+Inf"]
+        for bound, count in zip(bounds, histogram["counts"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{formatLabels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_sum{formatLabels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{formatLabels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# Only staff users can read the metrics, others get a 404
+def metricsView(request):
+    if not request.user.is_staff:
+        raise Http404()
+    metrics.flush()
+    return HttpResponse(
+        renderMetrics(*readMetrics()),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# Records the number, duration and queries of the requests of every URL name.
+# Unless METRICS_ENABLED is set, the middleware removes itself when the server starts.
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not isEnabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with wrapQueries(queries):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        url_name = (match.url_name if match else None) or "unmatched"
+        metrics.increment("drinkhub_requests_total", {
+            "url_name": url_name,
+            "method": request.method,
+            "status": response.status_code,
+        })
+        metrics.observe("drinkhub_request_duration_seconds", duration, {"url_name": url_name})
+        metrics.increment("drinkhub_db_queries_total", {"url_name": url_name}, queries.count)
+        metrics.increment("drinkhub_db_query_seconds_total", {"url_name": url_name}, queries.duration)
+        return response
@@ -0,0 +1,138 @@
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.base import Template
+from .queries import QueryCounter, wrapQueries
+
+logger = logging.getLogger("DrinkHub.profiling")
+
+# Profile of the request being handled by the current thread
+current = threading.local()
+
+
+# Times spent in a request, in seconds, and the queries it ran
+class RequestProfile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = None
+        self.view_end = None
+        self.rendering = False
+        self.template = 0.0
+        self.template_in_view = 0.0
+        self.queries = QueryCounter(keep_sql=True)
+
+    # Included templates are rendered within their parent, so only the outermost
+    # template of a render is timed
+    def timeRender(self, render, template, context):
+        if self.rendering:
+            return render(template, context)
+        self.rendering = True
+        start = time.perf_counter()
+        try:
+            return render(template, context)
+        finally:
+            self.rendering = False
+            duration = time.perf_counter() - start
+            self.template += duration
+            if self.view_start and not self.view_end:
+                self.template_in_view += duration
+
+    # Returns the durations in milliseconds. Templates rendered by the view itself,
+    # as render() does, aren't counted in the view's time.
+    def getTimings(self):
+        end = time.perf_counter()
+        view_end = self.view_end or end
+        view = (view_end - self.view_start - self.template_in_view) if self.view_start else 0.0
+        return {
+            "total": (end - self.start) * 1000,
+            "db": self.queries.duration * 1000,
+            "view": view * 1000,
+            "template": self.template * 1000,
+        }
+
+
+# Times every template rendered while a request of the thread is being profiled
+def instrumentTemplates():
+    render = Template.render
+    if getattr(render, "profiled", False):
+        return
+
+    @functools.wraps(render)
+    def profiledRender(template, context):
+        profile = getattr(current, "profile", None)
+        if profile is None:
+            return render(template, context)
+        return profile.timeRender(render, template, context)
+
+    profiledRender.profiled = True
+    Template.render = profiledRender
+
+
+# Profiles a sample of the requests: the number and duration of their queries, the
+# time spent in the view, rendering templates and in total. The timings are sent
+# back in a Server-Timing header and logged as one JSON line. The SQL of requests
+# slower than PROFILING_SLOW_REQUEST_MS is logged too. Unless PROFILING_ENABLED is
+# set, the middleware removes itself when the server starts.
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        instrumentTemplates()
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 1.0)
+        self.slow_request_ms = getattr(settings, "PROFILING_SLOW_REQUEST_MS", 500)
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        request.profile = current.profile = profile = RequestProfile()
+        try:
+            with wrapQueries(profile.queries):
+                response = self.get_response(request)
+        finally:
+            current.profile = None
+
+        timings = profile.getTimings()
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={timings["db"]:.1f};desc="{profile.queries.count} queries"',
+            f'view;dur={timings["view"]:.1f}',
+            f'template;dur={timings["template"]:.1f}',
+            f'total;dur={timings["total"]:.1f}',
+        ])
+        self.log(request, response, profile, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, "profile"):
+            request.profile.view_start = time.perf_counter()
+
+    # TemplateResponses are rendered once the view and this method have returned
+    def process_template_response(self, request, response):
+        if hasattr(request, "profile"):
+            request.profile.view_end = time.perf_counter()
+        return response
+
+    def log(self, request, response, profile, timings):
+        match = request.resolver_match
+        entry = {
+            "url_name": match.url_name if match else None,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": profile.queries.count,
+        }
+        entry.update({f"{name}_ms": round(duration, 1) for name, duration in timings.items()})
+
+        if timings["total"] < self.slow_request_ms:
+            logger.info(json.dumps(entry))
+            return
+        entry["sql"] = [
+            {"sql": sql, "ms": round(duration * 1000, 1)} for sql, duration in profile.queries.queries
+        ]
+        logger.warning(json.dumps(entry))
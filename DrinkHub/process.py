@@ -0,0 +1,28 @@
+import atexit
+import os
+import threading
+from abc import ABC, abstractmethod
+
+
+# Base of the state a process keeps in memory until it's flushed. Worker processes
+# forked from a preloaded master inherit the master's copy, so every method that
+# touches the state calls checkProcess first to start a new process from nothing.
+# Subclasses extend reset to set up their state and define flush, which also runs
+# when the process exits. Commands that switch databases, like the benchmark, have
+# to flush or reset the state themselves before leaving the database they used.
+class ProcessState(ABC):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+        atexit.register(self.flush)
+
+    def reset(self):
+        self.pid = os.getpid()
+
+    @abstractmethod
+    def flush(self):
+        pass
+
+    def checkProcess(self):
+        if self.pid != os.getpid():
+            self.reset()
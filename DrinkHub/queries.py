@@ -0,0 +1,32 @@
+import time
+from contextlib import ExitStack, contextmanager
+from django.db import connections
+
+
+# Database execute wrapper counting the queries of a request and the time they
+# took. With keep_sql, the SQL and duration of every query are kept too.
+class QueryCounter:
+    def __init__(self, keep_sql=False):
+        self.count = 0
+        self.duration = 0.0
+        self.queries = [] if keep_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if self.queries is not None:
+                self.queries.append((sql, duration))
+
+
+# Runs the queries of every database through the wrapper
+@contextmanager
+def wrapQueries(wrapper):
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'DrinkHub.middleware.ProfilingMiddleware',
+    'DrinkHub.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -123,6 +126,65 @@ USE_L10N = True
 USE_TZ = True
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# The local-memory cache is private to each process. When running several worker
+# processes, use a shared backend such as Memcached so that they all see the same
+# catalog version.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'drinkhub',
+    }
+}
+
+# Seconds the catalog pages stay cached. Entries are also replaced whenever the
+# catalog changes.
+CATALOG_CACHE_TIMEOUT = 3600
+
+
+# Request profiling, see DrinkHub.middleware.ProfilingMiddleware.
+# Only the given fraction of requests is profiled. Slower requests log their SQL.
+
+PROFILING_ENABLED = False
+
+PROFILING_SAMPLE_RATE = 1.0
+
+PROFILING_SLOW_REQUEST_MS = 500
+
+
+# Metrics, see DrinkHub.metrics. Every process writes its metrics to METRICS_DIR
+# and the metrics/ endpoint adds them up for staff users.
+
+METRICS_ENABLED = False
+
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'drinkhub-metrics')
+
+METRICS_FLUSH_INTERVAL = 1.0
+
+
+# Logging
+# https://docs.djangoproject.com/en/3.1/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'DrinkHub.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
@@ -132,6 +194,12 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 MEDIA_URL = '/media/'
 
+# Seconds between the saves of the drink view counts of every process
+VIEW_COUNTS_FLUSH_INTERVAL = 10.0
+
+# Number of background threads making profile image thumbnails
+PROFILE_IMAGE_WORKERS = 2
+
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 LOGIN_REDIRECT_URL = 'drinks-home'
@@ -140,7 +208,14 @@ LOGOUT_REDIRECT_URL = 'drinks-home'
 
 LOGIN_URL = 'login'
 
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Emails are saved to an outbox and delivered by the drain_outbox command
+# through OUTBOX_EMAIL_BACKEND, which can be set to the console or file
+# backend for development
+EMAIL_BACKEND = "users.mail.OutboxEmailBackend"
+
+OUTBOX_EMAIL_BACKEND = os.environ.get(
+    "OUTBOX_EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend"
+)
 
 EMAIL_HOST = "smtp.gmail.com"
 
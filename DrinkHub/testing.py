@@ -0,0 +1,13 @@
+from django.test import TestCase
+
+
+# Every view has to run a fixed number of queries whatever the amount of data.
+# Two of the queries of every logged in request load the session and the user.
+class QueryBudgetTestCase(TestCase):
+    def assertQueryBudget(self, budget, url, data=None):
+        with self.assertNumQueries(budget):
+            response = self.client.get(url, data)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return response
@@ -0,0 +1,116 @@
+import json
+import os
+import subprocess
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .metrics import MetricsCollector, metrics, readMetrics
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0, PROFILING_SLOW_REQUEST_MS=60000)
+class ProfilingTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("user", "user@example.com", "password")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    # The queries load the session and the user
+    def test_server_timing(self):
+        with self.assertLogs("DrinkHub.profiling", "INFO") as logs:
+            response = self.client.get(reverse("drinks-about"))
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="2 queries", view;dur=[\d.]+, template;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry["url_name"], entry["status"], entry["queries"]), ("drinks-about", 200, 2))
+        self.assertNotIn("sql", entry)
+
+    # The about page is rendered by the view with render() rather than a TemplateResponse
+    def test_template_timing(self):
+        with self.assertLogs("DrinkHub.profiling", "INFO") as logs:
+            self.client.get(reverse("drinks-about"))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertGreater(entry["template_ms"], 0)
+        self.assertLessEqual(entry["view_ms"] + entry["template_ms"], entry["total_ms"])
+
+    def test_slow_request(self):
+        with override_settings(PROFILING_SLOW_REQUEST_MS=0):
+            with self.assertLogs("DrinkHub.profiling", "WARNING") as logs:
+                self.client.get(reverse("drinks-about"))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(entry["sql"]), 2)
+
+
+class MetricsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("user", "user@example.com", "password")
+        cls.staff = User.objects.create_user("staff", "staff@example.com", "password", is_staff=True)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(METRICS_ENABLED=True, METRICS_DIR=self.directory, METRICS_FLUSH_INTERVAL=3600)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_metrics(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("drinks-about"))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        lines = response.content.decode().splitlines()
+        self.assertIn('drinkhub_requests_total{method="GET",status="200",url_name="drinks-about"} 1', lines)
+        self.assertIn('drinkhub_db_queries_total{url_name="drinks-about"} 2', lines)
+        self.assertIn('drinkhub_request_duration_seconds_count{url_name="drinks-about"} 1', lines)
+
+    # The files of processes that exited are left out and deleted
+    def test_exited_processes(self):
+        process = subprocess.Popen(["true"])
+        process.wait()
+        path = os.path.join(self.directory, f"metrics-{process.pid}.json")
+        with open(path, "w") as file:
+            json.dump({"counters": [["drinkhub_requests_total", [["method", "GET"]], 5]], "histograms": []}, file)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("metrics"))
+        self.assertNotIn('drinkhub_requests_total{method="GET"} 5', response.content.decode())
+        self.assertFalse(os.path.exists(path))
+
+    def getFiles(self):
+        return os.listdir(self.directory)
+
+    def test_flush_when_due(self):
+        metrics.increment("drinkhub_requests_total")
+        self.assertEqual(self.getFiles(), [])
+        with override_settings(METRICS_FLUSH_INTERVAL=0):
+            metrics.increment("drinkhub_requests_total")
+        self.assertEqual(self.getFiles(), [f"metrics-{os.getpid()}.json"])
+        counters, histograms = readMetrics()
+        self.assertEqual(counters, {("drinkhub_requests_total", ()): 2})
+
+    def test_flush_at_exit(self):
+        with mock.patch("atexit.register") as register:
+            collector = MetricsCollector()
+        register.assert_called_once_with(collector.flush)
+
+        collector.increment("drinkhub_requests_total")
+        register.call_args[0][0]()
+        self.assertEqual(readMetrics()[0], {("drinkhub_requests_total", ()): 1})
+
+    def test_disabled(self):
+        with override_settings(METRICS_ENABLED=False):
+            metrics.increment("drinkhub_requests_total")
+            metrics.flush()
+        self.assertEqual(os.listdir(self.directory), [])
@@ -17,9 +17,11 @@ from django.contrib import admin
 from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, include
+from .metrics import metricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', metricsView, name="metrics"),
     path('', include("drinks.urls")),
     path('', include("users.urls")),
 ] 
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DrinkHub.settings')
 
 application = get_wsgi_application()
+
+# The in-process name indexes are built before the first request
+from drinks.indexes import warmIndexes
+
+warmIndexes()
@@ -1,7 +1,35 @@
 from django.contrib import admin
-from .models import Drink, Ingredient, Recipe
+from .forms import RecipeAdminForm
+from .models import Drink, Ingredient, Recipe, DrinkOfTheDay, SimilarDrink, DrinkViews, Favorite
+
+
+# The names of these rows include their drinks and ingredients
+class RecipeAdmin(admin.ModelAdmin):
+    form = RecipeAdminForm
+    list_select_related = ["Drink", "Ingredient"]
+
+
+class DrinkOfTheDayAdmin(admin.ModelAdmin):
+    list_select_related = ["Drink"]
+
+
+class SimilarDrinkAdmin(admin.ModelAdmin):
+    list_select_related = ["Drink", "Similar"]
+
+
+class DrinkViewsAdmin(admin.ModelAdmin):
+    list_select_related = ["Drink"]
+
+
+class FavoriteAdmin(admin.ModelAdmin):
+    list_select_related = ["User", "Drink"]
+
 
 # Register your models here.
 admin.site.register(Drink)
 admin.site.register(Ingredient)
-admin.site.register(Recipe)
\ No newline at end of file
+admin.site.register(Recipe, RecipeAdmin)
+admin.site.register(DrinkOfTheDay, DrinkOfTheDayAdmin)
+admin.site.register(SimilarDrink, SimilarDrinkAdmin)
+admin.site.register(DrinkViews, DrinkViewsAdmin)
+admin.site.register(Favorite, FavoriteAdmin)
@@ -0,0 +1,160 @@
+import hashlib
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.generic import View
+from .filters import DrinkFilter
+from .models import Drink, Ingredient, Recipe
+from .pagination import paginateByCursor
+
+# Part of every ETag, so clients refetch when the shape of the payloads changes
+PAYLOAD_VERSION = "1"
+
+PAGE_SIZE = 30
+
+
+def makeEtag(*parts):
+    data = "|".join(str(part) for part in (PAYLOAD_VERSION,) + parts)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def jsonResponse(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={"separators": (",", ":")})
+
+
+def serializeDrink(drink):
+    return {
+        "id": drink.pk,
+        "Name": drink.Name,
+        "Type": drink.Type,
+        "Alcohol": drink.Alcohol,
+        "Datestamp": drink.Datestamp.isoformat(),
+        "Modified": drink.Modified.isoformat(),
+    }
+
+
+def serializeIngredient(ingredient):
+    return {
+        "id": ingredient.pk,
+        "Name": ingredient.Name,
+        "Alcohol": ingredient.Alcohol,
+        "Modified": ingredient.Modified.isoformat(),
+    }
+
+
+def serializeRecipeItem(item):
+    return {
+        "Ingredient": {
+            "id": item.Ingredient_id,
+            "Name": item.Ingredient.Name,
+            "Alcohol": item.Ingredient.Alcohol,
+        },
+        "Quantity": str(item.Quantity),
+        "Measurement": item.Measurement,
+    }
+
+
+# The page of drinks is read once per request, when its ETag is computed, and
+# only serialized if the client doesn't already have it.
+def getDrinkPage(request):
+    if not hasattr(request, "drink_page"):
+        filterset = DrinkFilter(request.GET, queryset=Drink.objects.all())
+        if filterset.is_valid():
+            request.drink_page = paginateByCursor(
+                filterset.qs, "Name", PAGE_SIZE, request.GET.get("cursor")
+            )
+        else:
+            request.drink_page = None
+            request.drink_errors = filterset.errors
+    return request.drink_page
+
+
+def drinkListEtag(request, *args, **kwargs):
+    page = getDrinkPage(request)
+    if page is None:
+        return None
+    return makeEtag(
+        page.next_cursor,
+        page.previous_cursor,
+        *(f"{drink.pk}:{drink.Modified.timestamp()}" for drink in page)
+    )
+
+
+def drinkListLastModified(request, *args, **kwargs):
+    page = getDrinkPage(request)
+    if not page:
+        return None
+    return max(drink.Modified for drink in page)
+
+
+# Only the Modified time of the drink is read to answer conditional requests.
+# Recipe changes and ingredient renames update it, see drinks.signals.
+def getDrinkModified(request, pk):
+    if not hasattr(request, "drink_modified"):
+        request.drink_modified = Drink.objects.filter(pk=pk).values_list("Modified", flat=True).first()
+    return request.drink_modified
+
+
+def drinkEtag(request, pk):
+    modified = getDrinkModified(request, pk)
+    return makeEtag("drink", pk, modified.timestamp()) if modified else None
+
+
+def drinkLastModified(request, pk):
+    return getDrinkModified(request, pk)
+
+
+def getIngredientModified(request, pk):
+    if not hasattr(request, "ingredient_modified"):
+        request.ingredient_modified = Ingredient.objects.filter(pk=pk).values_list(
+            "Modified", flat=True
+        ).first()
+    return request.ingredient_modified
+
+
+def ingredientEtag(request, pk):
+    modified = getIngredientModified(request, pk)
+    return makeEtag("ingredient", pk, modified.timestamp()) if modified else None
+
+
+def ingredientLastModified(request, pk):
+    return getIngredientModified(request, pk)
+
+
+# Clients are logged in with their session, so responses may only be cached
+# privately and are revalidated with the ETag on every use.
+@method_decorator(cache_control(private=True, no_cache=True), name="dispatch")
+class ApiView(LoginRequiredMixin, View):
+    raise_exception = True
+
+
+class DrinkListApiView(ApiView):
+    @method_decorator(condition(etag_func=drinkListEtag, last_modified_func=drinkListLastModified))
+    def get(self, request, *args, **kwargs):
+        page = getDrinkPage(request)
+        if page is None:
+            return jsonResponse({"errors": request.drink_errors}, status=400)
+        return jsonResponse({
+            "results": [serializeDrink(drink) for drink in page],
+            "next": page.next_cursor,
+            "previous": page.previous_cursor,
+        })
+
+
+class DrinkDetailApiView(ApiView):
+    @method_decorator(condition(etag_func=drinkEtag, last_modified_func=drinkLastModified))
+    def get(self, request, pk):
+        drink = get_object_or_404(Drink, pk=pk)
+        recipe = Recipe.objects.filter(Drink=drink).select_related("Ingredient").order_by("Ingredient__Name")
+        data = serializeDrink(drink)
+        data["Recipe"] = [serializeRecipeItem(item) for item in recipe]
+        return jsonResponse(data)
+
+
+class IngredientDetailApiView(ApiView):
+    @method_decorator(condition(etag_func=ingredientEtag, last_modified_func=ingredientLastModified))
+    def get(self, request, pk):
+        return jsonResponse(serializeIngredient(get_object_or_404(Ingredient, pk=pk)))
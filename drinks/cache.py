@@ -0,0 +1,107 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import transaction
+from DrinkHub.metrics import metrics
+
+# Cached catalog data is keyed by a version number that's bumped whenever drinks,
+# ingredients or recipes change, so stale entries are never read again and simply
+# expire. The counter lives in the cache itself, which makes it shared by all the
+# worker processes when a shared backend (Memcached, Redis, ...) is configured.
+CATALOG_VERSION_KEY = "drinks:catalog-version"
+
+
+def getCacheTimeout():
+    return getattr(settings, "CATALOG_CACHE_TIMEOUT", 3600)
+
+
+# The counter starts from the current time, so versions used before it was evicted
+# from the cache aren't handed out again.
+def getCatalogVersion():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY, 0)
+    return version
+
+
+def bumpCatalogVersion():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+# Bumps the version once the current transaction has been committed, so nothing
+# read before the commit can be cached under the new version.
+def catalogChanged():
+    transaction.on_commit(bumpCatalogVersion)
+
+
+# Sorts the parameters and drops the empty ones, so equivalent querystrings share
+# a cache entry. Only the given parameters are kept, which stops arbitrary ones
+# from filling the cache.
+def normalizeQuery(query, parameters):
+    return urlencode(sorted(
+        (key, value)
+        for key in parameters
+        for value in query.getlist(key)
+        if value != ""
+    ))
+
+
+# Reads cached catalog data, counting the hits and misses
+def getCachedData(key):
+    data = cache.get(key)
+    metrics.increment("drinkhub_cache_requests_total", {
+        "cache": "catalog",
+        "result": "miss" if data is None else "hit",
+    })
+    return data
+
+
+def getCatalogCacheKey(name, *parts):
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f"drinks:{name}:{getCatalogVersion()}:{digest}"
+
+
+# Caches the page of a ListView under the catalog version and its querystring.
+# Only data is cached, so the page is still rendered for the user viewing it.
+class CatalogPageCacheMixin:
+    cache_name = None
+    cache_parameters = []
+
+    def paginate_queryset(self, queryset, page_size):
+        key = getCatalogCacheKey(
+            self.cache_name or self.request.resolver_match.url_name,
+            normalizeQuery(self.request.GET, self.cache_parameters)
+        )
+        cached = getCachedData(key)
+        if cached is None:
+            paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+            if paginator is None:
+                cached = {"page": page, "is_paginated": is_paginated}
+            else:
+                cached = {
+                    "count": paginator.count,
+                    "number": page.number,
+                    "object_list": list(object_list),
+                    "is_paginated": is_paginated,
+                }
+            cache.set(key, cached, getCacheTimeout())
+        return self.restorePage(cached, page_size)
+
+    # Pages by number are rebuilt around a paginator of the right size, as the
+    # original one holds the queryset
+    def restorePage(self, cached, page_size):
+        if "page" in cached:
+            page = cached["page"]
+            return (None, page, page.object_list, cached["is_paginated"])
+        paginator = self.get_paginator(
+            range(cached["count"]), page_size, orphans=self.get_paginate_orphans()
+        )
+        page = Page(cached["object_list"], cached["number"], paginator)
+        return (paginator, page, page.object_list, cached["is_paginated"])
@@ -0,0 +1,292 @@
+import csv
+import json
+from itertools import groupby, islice
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .cache import bumpCatalogVersion
+from .models import Drink, Ingredient, Recipe
+from .services import recountIngredientUsage
+
+# The catalog is read and written one drink at a time, either as JSON Lines:
+#   {"Name": ..., "Type": ..., "Alcohol": ..., "Datestamp": ..., "Recipe": [
+#    {"Ingredient": ..., "Alcohol": ..., "Quantity": ..., "Measurement": ...}, ...]}
+# or as CSV with one row per recipe item, the rows of a drink being consecutive.
+# A drink without a recipe has a single row with an empty Ingredient. The Alcohol
+# of a drink is always computed from its recipe when it's imported.
+#
+# A record that can't be imported is skipped with an InvalidRecord saying why,
+# so one bad line doesn't abort the whole import.
+CSV_FIELDS = ["Drink", "Type", "Datestamp", "Ingredient", "Alcohol", "Quantity", "Measurement"]
+
+# Columns a CSV file can't be read without
+CSV_REQUIRED_FIELDS = ["Drink", "Type", "Ingredient", "Quantity", "Measurement"]
+
+FORMATS = ["jsonl", "csv"]
+
+
+class InvalidRecord(Exception):
+    pass
+
+
+# Raised when a whole file can't be read, e.g. a CSV file missing a column
+class InvalidCatalog(Exception):
+    pass
+
+
+def parseBoolean(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y", "t")
+    return bool(value)
+
+
+# Yields an InvalidRecord in place of the lines that don't hold a JSON object
+def readJsonLines(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as error:
+            yield InvalidRecord(f"Line {number} isn't valid JSON: {error}")
+            continue
+        if isinstance(data, dict):
+            yield data
+        else:
+            yield InvalidRecord(f"Line {number} isn't a JSON object")
+
+
+def readCsv(lines):
+    rows = csv.DictReader(lines)
+    if rows.fieldnames is None:
+        return
+    missing = [field for field in CSV_REQUIRED_FIELDS if field not in rows.fieldnames]
+    if missing:
+        raise InvalidCatalog(f"The CSV file has no {', '.join(missing)} column.")
+
+    for name, items in groupby(rows, key=lambda row: row["Drink"]):
+        items = list(items)
+        yield {
+            "Name": name,
+            "Type": items[0]["Type"],
+            "Datestamp": items[0].get("Datestamp"),
+            "Recipe": [
+                {
+                    "Ingredient": item["Ingredient"],
+                    "Alcohol": item.get("Alcohol"),
+                    "Quantity": item["Quantity"],
+                    "Measurement": item["Measurement"],
+                }
+                for item in items if item["Ingredient"]
+            ],
+        }
+
+
+def readCatalog(lines, format):
+    if format == "csv":
+        return readCsv(lines)
+    return readJsonLines(lines)
+
+
+# Yields every drink with its recipe. The drinks are read through a server-side
+# cursor and the recipe items of each chunk of drinks with one joined query,
+# so memory use doesn't depend on the size of the catalog.
+def iterCatalog(chunk_size=2000):
+    drinks = Drink.objects.order_by("pk").values_list(
+        "pk", "Name", "Type", "Alcohol", "Datestamp"
+    ).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(drinks, chunk_size))
+        if not chunk:
+            return
+
+        recipes = {}
+        items = Recipe.objects.filter(
+            Drink_id__in=[pk for pk, *fields in chunk]
+        ).order_by("Drink_id", "Ingredient__Name").values_list(
+            "Drink_id", "Ingredient__Name", "Ingredient__Alcohol", "Quantity", "Measurement"
+        )
+        for drink_id, ingredient, alcohol, quantity, measurement in items:
+            recipes.setdefault(drink_id, []).append({
+                "Ingredient": ingredient,
+                "Alcohol": alcohol,
+                "Quantity": str(quantity),
+                "Measurement": measurement,
+            })
+
+        for pk, name, type, alcohol, datestamp in chunk:
+            yield {
+                "Name": name,
+                "Type": type,
+                "Alcohol": alcohol,
+                "Datestamp": datestamp.isoformat(),
+                "Recipe": recipes.get(pk, []),
+            }
+
+
+def writeJsonLines(drinks):
+    for drink in drinks:
+        yield json.dumps(drink, separators=(",", ":")) + "\n"
+
+
+# csv.writer only needs an object with a write method, which here returns the row
+class Echo:
+    def write(self, value):
+        return value
+
+
+def writeCsv(drinks):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for drink in drinks:
+        for item in drink["Recipe"] or [{}]:
+            yield writer.writerow([
+                drink["Name"],
+                drink["Type"],
+                drink["Datestamp"],
+                item.get("Ingredient", ""),
+                item.get("Alcohol", ""),
+                item.get("Quantity", ""),
+                item.get("Measurement", ""),
+            ])
+
+
+# Yields the catalog as lines of text in the given format
+def writeCatalog(drinks, format):
+    if format == "csv":
+        return writeCsv(drinks)
+    return writeJsonLines(drinks)
+
+
+# Imports drinks in batches, each written with bulk_create in its own transaction.
+# Ingredient names are resolved through an in-memory map, new ingredients are
+# created as they're first seen and drinks that already exist are skipped.
+class CatalogImporter:
+    def __init__(self):
+        self.ingredients = {
+            name: (pk, alcohol)
+            for pk, name, alcohol in Ingredient.objects.values_list("pk", "Name", "Alcohol").iterator()
+        }
+        self.drink_names = set(Drink.objects.values_list("Name", flat=True).iterator())
+        self.drinks = 0
+        self.recipe_items = 0
+        self.skipped = 0
+        self.invalid = []
+
+    # Malformed recipes are left for buildDrink to report
+    def saveIngredients(self, drinks):
+        new_ingredients = {}
+        for data in drinks:
+            if isinstance(data, InvalidRecord):
+                continue
+            try:
+                for item in data.get("Recipe", []):
+                    name = item["Ingredient"]
+                    if name in self.ingredients or name in new_ingredients:
+                        continue
+                    ingredient = Ingredient(Name=name, Alcohol=parseBoolean(item.get("Alcohol", False)))
+                    try:
+                        ingredient.clean_fields()
+                    except ValidationError:
+                        continue
+                    new_ingredients[name] = ingredient
+            except (AttributeError, KeyError, TypeError):
+                continue
+        if not new_ingredients:
+            return
+
+        Ingredient.objects.bulk_create(new_ingredients.values(), ignore_conflicts=True)
+        saved = Ingredient.objects.filter(Name__in=new_ingredients).values_list("pk", "Name", "Alcohol")
+        for pk, name, alcohol in saved:
+            self.ingredients[name] = (pk, alcohol)
+
+    # Builds the drink and its recipe items. Returns None if the drink already
+    # exists and raises InvalidRecord if it can't be imported.
+    def buildDrink(self, data):
+        name = data.get("Name")
+        if not isinstance(name, str) or not name:
+            raise InvalidRecord(f"A drink has no name: {data}")
+        if name in self.drink_names:
+            return None
+
+        drink = Drink(Name=name, Type=data.get("Type"))
+        if data.get("Datestamp"):
+            drink.Datestamp = data["Datestamp"]
+
+        items = {}
+        try:
+            for item in data.get("Recipe", []):
+                ingredient = self.ingredients.get(item["Ingredient"])
+                if ingredient is None:
+                    raise InvalidRecord(f"Drink {name!r} uses the invalid ingredient {item['Ingredient']!r}")
+                if ingredient[0] in items:
+                    continue
+                items[ingredient[0]] = Recipe(
+                    Ingredient_id=ingredient[0],
+                    Quantity=item["Quantity"],
+                    Measurement=item["Measurement"]
+                )
+                drink.Alcohol = drink.Alcohol or ingredient[1]
+        except KeyError as error:
+            raise InvalidRecord(f"A recipe item of drink {name!r} has no {error}")
+        except (AttributeError, TypeError):
+            raise InvalidRecord(f"Drink {name!r} has a malformed recipe")
+
+        try:
+            drink.clean_fields()
+            for recipe_item in items.values():
+                recipe_item.clean_fields(exclude=["Drink", "Ingredient"])
+        except ValidationError as error:
+            raise InvalidRecord(f"Drink {name!r} is invalid: {'; '.join(error.messages)}")
+        return drink, list(items.values())
+
+    def skipInvalid(self, error):
+        self.invalid.append(str(error))
+        self.skipped += 1
+
+    def importBatch(self, drinks):
+        with transaction.atomic():
+            self.saveIngredients(drinks)
+
+            built = []
+            for data in drinks:
+                if isinstance(data, InvalidRecord):
+                    self.skipInvalid(data)
+                    continue
+                try:
+                    result = self.buildDrink(data)
+                except InvalidRecord as error:
+                    self.skipInvalid(error)
+                    continue
+                if result is None:
+                    self.skipped += 1
+                    continue
+                self.drink_names.add(result[0].Name)
+                built.append(result)
+            if not built:
+                return
+
+            Drink.objects.bulk_create([drink for drink, items in built])
+
+            # Databases that can't return the new primary keys need them looked up
+            if built[0][0].pk is None:
+                pks = dict(
+                    Drink.objects.filter(
+                        Name__in=[drink.Name for drink, items in built]
+                    ).values_list("Name", "pk")
+                )
+                for drink, items in built:
+                    drink.pk = pks[drink.Name]
+
+            recipe_items = []
+            for drink, items in built:
+                for item in items:
+                    item.Drink_id = drink.pk
+                    recipe_items.append(item)
+            Recipe.objects.bulk_create(recipe_items)
+            recountIngredientUsage({item.Ingredient_id for item in recipe_items})
+
+        bumpCatalogVersion()
+
+        self.drinks += len(built)
+        self.recipe_items += len(recipe_items)
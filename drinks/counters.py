@@ -0,0 +1,100 @@
+import logging
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from DrinkHub.process import ProcessState
+from .cache import getCachedData, getCacheTimeout, getCatalogCacheKey
+from .models import Drink, DrinkViews
+
+logger = logging.getLogger(__name__)
+
+# Number of drinks on the most popular drinks page
+POPULAR_DRINKS = 30
+
+
+# Counts the views of every drink in memory and adds them to the DrinkViews table
+# at most once every VIEW_COUNTS_FLUSH_INTERVAL seconds, with one upsert, so
+# opening a drink never writes to the database. The views of the last seconds
+# are lost if the process is killed, which is fine for a popularity ranking.
+class ViewCounter(ProcessState):
+    def reset(self):
+        super().reset()
+        self.counts = Counter()
+        self.flushed = time.monotonic()
+
+    def increment(self, drink_id):
+        with self.lock:
+            self.checkProcess()
+            self.counts[drink_id] += 1
+            due = time.monotonic() - self.flushed >= getattr(settings, "VIEW_COUNTS_FLUSH_INTERVAL", 10.0)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            self.checkProcess()
+            counts, self.counts = self.counts, Counter()
+            self.flushed = time.monotonic()
+        if not counts:
+            return
+
+        try:
+            saveViews(counts)
+        except DatabaseError:
+            logger.warning("Could not save the views of %d drinks", len(counts), exc_info=True)
+            with self.lock:
+                self.counts.update(counts)
+            return
+        refreshPopularDrinks()
+
+
+viewCounter = ViewCounter()
+
+
+# Adds the views to the counts of the drinks in one INSERT ... ON CONFLICT, which
+# both PostgreSQL and SQLite support. Drinks deleted since they were viewed are
+# left out.
+def saveViews(counts):
+    table = connection.ops.quote_name(DrinkViews._meta.db_table)
+    drink_column = connection.ops.quote_name(DrinkViews._meta.get_field("Drink").column)
+    views_column = connection.ops.quote_name(DrinkViews._meta.get_field("Views").column)
+
+    with transaction.atomic():
+        existing = Drink.objects.filter(pk__in=counts).values_list("pk", flat=True)
+        rows = [(pk, counts[pk]) for pk in existing]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({drink_column}, {views_column}) "
+                f"VALUES {', '.join(['(%s, %s)'] * len(rows))} "
+                f"ON CONFLICT ({drink_column}) "
+                f"DO UPDATE SET {views_column} = {table}.{views_column} + EXCLUDED.{views_column}",
+                [value for row in rows for value in row]
+            )
+
+
+def getPopularDrinksCacheKey():
+    return getCatalogCacheKey("popular-drinks")
+
+
+# Ranks the drinks by their views, from the index on Views, and caches the result
+# for the popular drinks page. It's refreshed whenever views are saved and
+# recomputed once the catalog changes.
+def refreshPopularDrinks():
+    popular = [
+        (drink_views.Drink, drink_views.Views)
+        for drink_views in DrinkViews.objects.select_related("Drink").order_by("-Views", "Drink")[:POPULAR_DRINKS]
+    ]
+    cache.set(getPopularDrinksCacheKey(), popular, getCacheTimeout())
+    return popular
+
+
+# Returns the most viewed drinks as (drink, views) pairs
+def getPopularDrinks():
+    popular = getCachedData(getPopularDrinksCacheKey())
+    if popular is None:
+        popular = refreshPopularDrinks()
+    return popular
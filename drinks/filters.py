@@ -1,8 +1,11 @@
 from django_filters import FilterSet, CharFilter
 from .models import Drink, Ingredient
+from .search import searchByName
 from django.db.models import CharField
 
 class DrinkFilter(FilterSet):
+    Name = CharFilter(method="filterName")
+
     class Meta:
         model = Drink
         fields = ["Name", "Type", "Alcohol"]
@@ -15,8 +18,13 @@ class DrinkFilter(FilterSet):
             }
         }
 
+    def filterName(self, queryset, name, value):
+        return searchByName(queryset, name, value)
+
 
 class IngredientFilter(FilterSet):
+    Name = CharFilter(method="filterName")
+
     class Meta:
         model = Ingredient
         fields = ["Name", "Alcohol"]
@@ -27,4 +35,7 @@ class IngredientFilter(FilterSet):
                     'lookup_expr': 'icontains',
                 },
             }
-        }
\ No newline at end of file
+        }
+
+    def filterName(self, queryset, name, value):
+        return searchByName(queryset, name, value)
@@ -1,5 +1,20 @@
-from django.forms import ModelForm
-from .models import Recipe
+import re
+from django.core.exceptions import ValidationError
+from django.forms import (
+    BaseInlineFormSet,
+    Form,
+    ModelForm,
+    ModelChoiceField,
+    ModelMultipleChoiceField,
+    IntegerField,
+    inlineformset_factory
+)
+from .models import Drink, Ingredient, Recipe
+from .widgets import (
+    DrinkAutocompleteWidget,
+    IngredientAutocompleteWidget,
+    IngredientMultipleAutocompleteWidget
+)
 
 class RecipeCreateForm(ModelForm):
     class Meta:
@@ -13,4 +28,110 @@ class RecipeUpdateForm(ModelForm):
         fields = ["Drink", "Quantity", "Measurement"]
 
 
+class RecipeForm(ModelForm):
+    class Meta:
+        model = Recipe
+        fields = ["Ingredient", "Quantity", "Measurement"]
+        widgets = { "Ingredient": IngredientAutocompleteWidget() }
+
+
+# Looks the chosen row up in `instances`, by pk, before querying it
+class PrefetchedModelChoiceField(ModelChoiceField):
+    instances = {}
+
+    def to_python(self, value):
+        if str(value) in self.instances:
+            return self.instances[str(value)]
+        return super().to_python(value)
+
+
+# A line of the recipe editor. The formset rejects ingredients used twice and the
+# drink is locked while its recipe is saved, so lines aren't checked one by one
+# against the database. The chosen ingredient was just loaded by the formset.
+class RecipeItemForm(RecipeForm):
+    class Meta(RecipeForm.Meta):
+        field_classes = { "Ingredient": PrefetchedModelChoiceField }
+
+    def validate_unique(self):
+        pass
+
+    def _get_validation_exclusions(self):
+        return super()._get_validation_exclusions() + ["Ingredient"]
+
+
+# Loads the saved lines and the ingredients of every line, saved or submitted,
+# once and shares them with the fields and widgets of the forms, so the number
+# of queries doesn't depend on the number of lines
+class BaseRecipeFormSet(BaseInlineFormSet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.items = {str(item.pk): item for item in self.get_queryset()}
+        self.ingredients = {str(item.Ingredient_id): item.Ingredient for item in self.items.values()}
+        pattern = re.compile(rf"^{re.escape(self.prefix)}-\d+-Ingredient$")
+        submitted = {
+            value for key, value in self.data.items()
+            if pattern.match(key) and value.isdigit() and value not in self.ingredients
+        }
+        if submitted:
+            for ingredient in Ingredient.objects.filter(pk__in=submitted):
+                self.ingredients[str(ingredient.pk)] = ingredient
+
+    def clean(self):
+        super().clean()
+        ingredients = set()
+        for form in self.forms:
+            if self._should_delete_form(form) or not form.cleaned_data.get("Ingredient"):
+                continue
+            if form.cleaned_data["Ingredient"] in ingredients:
+                raise ValidationError("Every ingredient can only be used once in a recipe.")
+            ingredients.add(form.cleaned_data["Ingredient"])
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        name = self._pk_field.name
+        field = form.fields[name]
+        form.fields[name] = PrefetchedModelChoiceField(
+            field.queryset, initial=field.initial, required=False, widget=field.widget
+        )
+        form.fields[name].instances = self.items
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        field = form.fields["Ingredient"]
+        field.instances = field.widget.instances = self.ingredients
+        return form
+
+
+RecipeFormSet = inlineformset_factory(
+    Drink,
+    Recipe,
+    form=RecipeItemForm,
+    formset=BaseRecipeFormSet,
+    fields=["Ingredient", "Quantity", "Measurement"],
+    extra=3,
+    can_delete=True
+)
+
+
+class RecipeAdminForm(ModelForm):
+    class Meta:
+        model = Recipe
+        fields = "__all__"
+        widgets = {
+            "Drink": DrinkAutocompleteWidget(),
+            "Ingredient": IngredientAutocompleteWidget()
+        }
+
 
+class MakeableDrinkForm(Form):
+    Ingredients = ModelMultipleChoiceField(
+        queryset=Ingredient.objects.all(),
+        widget=IngredientMultipleAutocompleteWidget()
+    )
+    Missing = IntegerField(
+        min_value = 0,
+        max_value = 5,
+        initial = 0,
+        required = False,
+        help_text = "Maximum number of ingredients you're missing."
+    )
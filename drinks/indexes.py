@@ -0,0 +1,264 @@
+import heapq
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from collections import Counter
+from django.core.cache import cache
+from django.db import DatabaseError
+from .models import Drink, Ingredient, Recipe
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of whether another process changed an index
+INDEX_SYNC_INTERVAL = 1.0
+
+
+# Base of the in-process indexes. Every worker process has its own copy. Changes
+# bump a version number in the shared cache, and a process that finds a version
+# it didn't make rebuilds its copy. The version is checked at most every
+# INDEX_SYNC_INTERVAL seconds.
+class SharedIndex(ABC):
+    def __init__(self, version_key):
+        self.version_key = version_key
+        self.lock = threading.RLock()
+        self.version = None
+        self.checked = 0.0
+
+    @abstractmethod
+    def isBuilt(self):
+        pass
+
+    # Subclasses read the version before the rows, so changes made while building
+    # cause a rebuild, and store it with markBuilt
+    @abstractmethod
+    def build(self):
+        pass
+
+    # Drops the built data, called with the lock held
+    @abstractmethod
+    def clear(self):
+        pass
+
+    # Drops the index so it's rebuilt on next use, e.g. after bulk changes
+    def invalidate(self):
+        with self.lock:
+            self.clear()
+        self.publishChange()
+
+    def markBuilt(self, version):
+        self.version = version
+        self.checked = time.monotonic()
+
+    def ensureBuilt(self):
+        if not self.isBuilt():
+            self.build()
+        elif time.monotonic() - self.checked >= INDEX_SYNC_INTERVAL:
+            self.checked = time.monotonic()
+            if cache.get(self.version_key) != self.version:
+                self.build()
+
+    # Tells the other processes to rebuild their copies. This process keeps its
+    # copy if nobody else changed the index since it was built.
+    def publishChange(self):
+        try:
+            version = cache.incr(self.version_key)
+        except ValueError:
+            version = time.time_ns()
+            if cache.add(self.version_key, version, None):
+                with self.lock:
+                    if self.version is None:
+                        self.version = version
+            return
+        with self.lock:
+            if self.version is not None and version == self.version + 1:
+                self.version = version
+
+
+# An in-process inverted index of the recipes, mapping every ingredient to the
+# drinks that use it. It's built from the Recipe table on first use and kept up
+# to date by drinks.services.recipesChanged.
+class RecipeIndex(SharedIndex):
+    def __init__(self):
+        super().__init__("drinks:recipe-index")
+        self.drinks = None
+        self.postings = None
+
+    def isBuilt(self):
+        return self.drinks is not None
+
+    def build(self):
+        version = cache.get(self.version_key)
+        drinks = {}
+        postings = {}
+        items = Recipe.objects.values_list("Drink_id", "Ingredient_id").iterator(chunk_size=10000)
+        for drink_id, ingredient_id in items:
+            drinks.setdefault(drink_id, set()).add(ingredient_id)
+            postings.setdefault(ingredient_id, set()).add(drink_id)
+        with self.lock:
+            self.drinks = drinks
+            self.postings = postings
+            self.markBuilt(version)
+
+    def clear(self):
+        self.drinks = None
+        self.postings = None
+
+    # Replaces the ingredients of the drinks with the ones saved in their recipes
+    def refreshDrinks(self, drink_ids):
+        if self.drinks is not None:
+            self.updateDrinks(drink_ids)
+        self.publishChange()
+
+    def updateDrinks(self, drink_ids):
+        ingredients = {drink_id: set() for drink_id in drink_ids}
+        items = Recipe.objects.filter(Drink_id__in=drink_ids).values_list("Drink_id", "Ingredient_id")
+        for drink_id, ingredient_id in items:
+            ingredients[drink_id].add(ingredient_id)
+
+        with self.lock:
+            if self.drinks is None:
+                return
+            for drink_id, ingredient_ids in ingredients.items():
+                for ingredient_id in self.drinks.pop(drink_id, set()):
+                    self.postings[ingredient_id].discard(drink_id)
+                for ingredient_id in ingredient_ids:
+                    self.postings.setdefault(ingredient_id, set()).add(drink_id)
+                if ingredient_ids:
+                    self.drinks[drink_id] = ingredient_ids
+
+    # Returns (drink pk, number of missing ingredients) for the drinks that use any
+    # of the ingredients and miss at most `missing` others, fewest missing first.
+    # Only the drinks in the posting lists of the ingredients are looked at.
+    def makeable(self, ingredient_ids, missing=0):
+        self.ensureBuilt()
+        with self.lock:
+            covered = Counter()
+            for ingredient_id in set(ingredient_ids):
+                covered.update(self.postings.get(ingredient_id, ()))
+            matches = [
+                (drink_id, len(self.drinks[drink_id]) - count)
+                for drink_id, count in covered.items()
+                if len(self.drinks[drink_id]) - count <= missing
+            ]
+        return sorted(matches, key=lambda match: (match[1], match[0]))
+
+    # Returns the (drink pk, Jaccard similarity) of the drinks whose ingredients are
+    # the most like the drink's. Only drinks sharing an ingredient are scored.
+    def similar(self, drink_id, limit):
+        self.ensureBuilt()
+        with self.lock:
+            ingredient_ids = self.drinks.get(drink_id, ())
+            overlap = Counter()
+            for ingredient_id in ingredient_ids:
+                overlap.update(self.postings[ingredient_id])
+            overlap.pop(drink_id, None)
+            scores = [
+                (other_id, count / (len(ingredient_ids) + len(self.drinks[other_id]) - count))
+                for other_id, count in overlap.items()
+            ]
+        return heapq.nlargest(limit, scores, key=lambda score: (score[1], -score[0]))
+
+
+# Lowercases the name and collapses its whitespace
+def normalizeName(name):
+    return " ".join(name.lower().split())
+
+
+# An in-process index of the names of a model, sorted so that the names starting
+# with a prefix are found by binary search. Every word of a name starts an entry,
+# so "lime" also finds "Fresh Lime Juice". It's built on first use and updated
+# one row at a time by the signals in drinks.signals.
+class NameIndex(SharedIndex):
+    def __init__(self, model, field="Name"):
+        super().__init__(f"drinks:name-index:{model._meta.model_name}")
+        self.model = model
+        self.field = field
+        self.entries = None
+        self.names = None
+
+    def isBuilt(self):
+        return self.entries is not None
+
+    @staticmethod
+    def getKeys(name):
+        words = normalizeName(name).split(" ")
+        return {" ".join(words[start:]) for start in range(len(words))}
+
+    def build(self):
+        version = cache.get(self.version_key)
+        names = dict(self.model.objects.values_list("pk", self.field).iterator(chunk_size=10000))
+        entries = sorted((key, pk) for pk, name in names.items() for key in self.getKeys(name))
+        with self.lock:
+            self.entries = entries
+            self.names = names
+            self.markBuilt(version)
+
+    def clear(self):
+        self.entries = None
+        self.names = None
+
+    def removeEntries(self, pk):
+        name = self.names.pop(pk, None)
+        if name is None:
+            return
+        for key in self.getKeys(name):
+            index = bisect_left(self.entries, (key, pk))
+            if index < len(self.entries) and self.entries[index] == (key, pk):
+                del self.entries[index]
+
+    def remove(self, pk):
+        with self.lock:
+            if self.entries is not None:
+                self.removeEntries(pk)
+        self.publishChange()
+
+    def update(self, pk, name):
+        with self.lock:
+            if self.entries is not None:
+                self.removeEntries(pk)
+                self.names[pk] = name
+                for key in self.getKeys(name):
+                    insort(self.entries, (key, pk))
+        self.publishChange()
+
+    # Returns (pk, name) of at most `limit` rows with a word starting with the prefix
+    def search(self, prefix, limit=10):
+        prefix = normalizeName(prefix)
+        if not prefix:
+            return []
+        self.ensureBuilt()
+        with self.lock:
+            results = {}
+            index = bisect_left(self.entries, (prefix,))
+            while index < len(self.entries) and len(results) < limit:
+                key, pk = self.entries[index]
+                if not key.startswith(prefix):
+                    break
+                results.setdefault(pk, self.names[pk])
+                index += 1
+        return list(results.items())
+
+
+recipeIndex = RecipeIndex()
+ingredientNames = NameIndex(Ingredient)
+drinkNames = NameIndex(Drink)
+
+
+# Drops every in-process index of this process and tells the others to rebuild
+# theirs. Needed after rows are saved without the signals, e.g. by bulk_create.
+def invalidateIndexes():
+    recipeIndex.invalidate()
+    ingredientNames.invalidate()
+    drinkNames.invalidate()
+
+
+# Builds the name indexes when a server starts, so the first searches don't wait.
+# If the database can't be reached yet, they're built on first use instead.
+def warmIndexes():
+    try:
+        drinkNames.build()
+        ingredientNames.build()
+    except DatabaseError:
+        logger.warning("Could not build the name indexes, they will be built on first use.")
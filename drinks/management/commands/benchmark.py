@@ -0,0 +1,256 @@
+import json
+import statistics
+import time
+import tracemalloc
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from DrinkHub.metrics import metrics
+from drinks import urls as drink_urls
+from drinks.counters import viewCounter
+from drinks.models import Drink, Ingredient, Recipe
+from users import urls as user_urls
+
+# Number of recipe items of the catalog at each scale
+DEFAULT_SCALES = [1000, 100000, 1000000]
+
+# The benchmark clears the cache between scales and with --cold-cache, so it runs
+# on a cache of its own instead of the one shared with the running site
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "drinkhub-benchmark",
+    }
+}
+
+# URLs that end the session, need a one-time token or only accept POST
+SKIPPED_URLS = {"logout", "password_reset_confirm", "drink-favorite"}
+
+
+# Returns (label, url name, kwargs, query) for every request of the benchmark.
+# Every URL of the drinks and users apps is requested, some with several queries.
+def getRequests(samples):
+    kwargs = {
+        "drink-detail": {"pk": samples["drink"]},
+        "drink-update": {"pk": samples["drink"]},
+        "drink-delete": {"pk": samples["drink"]},
+        "ingredient-detail": {"pk": samples["ingredient"]},
+        "ingredient-update": {"pk": samples["ingredient"]},
+        "ingredient-delete": {"pk": samples["ingredient"]},
+        "recipe-edit": {"drink_id": samples["drink"]},
+        "recipe-create": {"drink_id": samples["drink"]},
+        "recipe-update": {"drink_id": samples["drink"], "pk": samples["recipe_item"]},
+        "recipe-delete": {"drink_id": samples["drink"], "pk": samples["recipe_item"]},
+        "api-drink-detail": {"pk": samples["drink"]},
+        "api-ingredient-detail": {"pk": samples["ingredient"]},
+        "user-detail": {"pk": samples["user"]},
+        "user-delete": {"pk": samples["user"]},
+    }
+    queries = {
+        "drinks-list": [
+            ("drinks-list", {}),
+            ("drinks-list?Alcohol", {"Alcohol": "true"}),
+            ("drinks-list?Name", {"Name": samples["drink_name"][:6]}),
+        ],
+        "drinks-makeable": [
+            ("drinks-makeable", {"Ingredients": samples["ingredients"], "Missing": 1}),
+        ],
+        "drinks-export": [("drinks-export", {"format": "csv"})],
+        "ingredients-list": [
+            ("ingredients-list", {}),
+            ("ingredients-list?Name", {"Name": samples["ingredient_name"][:4]}),
+        ],
+        "api-drinks-list": [("api-drinks-list", {"Alcohol": "true"})],
+        "drinks-typeahead": [("drinks-typeahead", {"q": samples["drink_name"][:3]})],
+        "ingredients-autocomplete": [
+            ("ingredients-autocomplete", {"q": samples["ingredient_name"][:3]}),
+        ],
+    }
+
+    requests = []
+    for pattern in drink_urls.urlpatterns + user_urls.urlpatterns:
+        if pattern.name in SKIPPED_URLS:
+            continue
+        for label, query in queries.get(pattern.name, [(pattern.name, {})]):
+            requests.append((label, pattern.name, kwargs.get(pattern.name, {}), query))
+    return requests
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+# Seeds a test database at several scales and requests every URL of the site
+# through the test client as a superuser. The latency percentiles, number of
+# queries and peak memory of every request are compared with a stored baseline.
+class Command(BaseCommand):
+    help = "Benchmarks every page of the site on generated data at several scales."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            type=int,
+            nargs="+",
+            default=DEFAULT_SCALES,
+            help="Numbers of recipe items to benchmark with."
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Number of times every URL is requested at each scale."
+        )
+        parser.add_argument(
+            "--cold-cache",
+            action="store_true",
+            help="Clear the cache before every request."
+        )
+        parser.add_argument("--baseline", help="JSON file of results to compare with.")
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write the results to the baseline file instead of comparing."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Fraction by which p95 latency or peak memory may exceed the baseline."
+        )
+
+    def handle(self, *args, **options):
+        if options["save_baseline"] and not options["baseline"]:
+            raise CommandError("--save-baseline needs --baseline.")
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                results = {}
+                for scale in options["scales"]:
+                    self.seed(scale)
+                    results[str(scale)] = self.run(options["iterations"], options["cold_cache"])
+                    self.report(scale, results[str(scale)])
+        finally:
+            # The views and metrics of the benchmark's requests belong to the test
+            # database, so they're dropped instead of being flushed at exit
+            viewCounter.reset()
+            metrics.reset()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["save_baseline"]:
+            with open(options["baseline"], "w") as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Saved the baseline to {options['baseline']}."))
+        elif options["baseline"]:
+            self.compare(results, options["baseline"], options["tolerance"])
+
+    # Drinks average five recipe items and the other tables grow with the catalog
+    def seed(self, scale):
+        call_command("flush", interactive=False, verbosity=0)
+        cache.clear()
+        call_command(
+            "seed_benchmark_data",
+            drinks=max(1, scale // 5),
+            ingredients=max(50, scale // 500),
+            users=max(20, scale // 1000),
+            stdout=StringIO(),
+        )
+        call_command("compute_similar_drinks", stdout=StringIO())
+
+    def run(self, iterations, cold_cache):
+        superuser = User.objects.create_superuser("benchmark", "benchmark@example.com", "benchmark")
+        client = Client()
+        client.force_login(superuser)
+
+        drink = Drink.objects.order_by("pk").first()
+        ingredient = Ingredient.objects.order_by("pk").first()
+        samples = {
+            "drink": drink.pk,
+            "drink_name": drink.Name,
+            "ingredient": ingredient.pk,
+            "ingredient_name": ingredient.Name,
+            "ingredients": list(Ingredient.objects.order_by("pk").values_list("pk", flat=True)[:10]),
+            "recipe_item": Recipe.objects.filter(Drink=drink).values_list("pk", flat=True).first(),
+            "user": User.objects.exclude(pk=superuser.pk).values_list("pk", flat=True).first(),
+        }
+
+        results = {}
+        for label, name, kwargs, query in getRequests(samples):
+            url = reverse(name, kwargs=kwargs)
+            timings = []
+            queries = 0
+            for iteration in range(iterations):
+                if cold_cache:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = client.get(url, query)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                    timings.append(time.perf_counter() - start)
+                queries = max(queries, len(captured))
+                if response.status_code >= 400:
+                    raise CommandError(f"{label} returned {response.status_code}.")
+
+            # Tracing slows requests down, so memory is measured separately
+            if cold_cache:
+                cache.clear()
+            tracemalloc.start()
+            response = client.get(url, query)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[label] = {
+                "p50_ms": statistics.median(timings) * 1000,
+                "p95_ms": percentile(timings, 95) * 1000,
+                "queries": queries,
+                "peak_kib": peak / 1024,
+            }
+        return results
+
+    def report(self, scale, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{scale} recipe items"))
+        self.stdout.write(f"{'URL':<28} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KiB':>10}")
+        for label, result in results.items():
+            self.stdout.write(
+                f"{label:<28} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                f"{result['queries']:>8} {result['peak_kib']:>10.0f}"
+            )
+
+    # Any extra query is a regression, while timings and memory may vary a little
+    def compare(self, results, path, tolerance):
+        try:
+            with open(path) as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Could not read the baseline: {error}")
+
+        regressions = []
+        for scale, scale_results in results.items():
+            for label, result in scale_results.items():
+                expected = baseline.get(scale, {}).get(label)
+                if expected is None:
+                    continue
+                if result["queries"] > expected["queries"]:
+                    regressions.append(f"{scale} {label}: {expected['queries']} -> {result['queries']} queries")
+                for metric in ["p95_ms", "peak_kib"]:
+                    if result[metric] > expected[metric] * (1 + tolerance):
+                        regressions.append(
+                            f"{scale} {label}: {metric} {expected[metric]:.1f} -> {result[metric]:.1f}"
+                        )
+
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
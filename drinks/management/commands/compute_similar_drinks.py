@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand
+from drinks.indexes import recipeIndex
+from drinks.models import Drink
+from drinks.services import saveSimilarDrinks
+
+
+# Recomputes the similar drinks of the whole catalog from a fresh recipe index.
+# Every drink is only compared with the drinks sharing one of its ingredients.
+# With --stale, only the drinks flagged since their recipes or the recipes of their
+# similar drinks changed are scored, which is cheap enough to run every few minutes.
+class Command(BaseCommand):
+    help = "Computes the most similar drinks of every drink from their ingredients."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of drinks whose similar drinks are saved at a time."
+        )
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help="Only score the drinks whose similar drinks may be out of date."
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        recipeIndex.build()
+        drinks = Drink.objects.order_by("pk")
+        if options["stale"]:
+            drinks = drinks.filter(SimilarStale=True)
+        drink_ids = list(drinks.values_list("pk", flat=True))
+        batch_size = options["batch_size"]
+
+        saved = 0
+        for offset in range(0, len(drink_ids), batch_size):
+            saved += saveSimilarDrinks(drink_ids[offset:offset + batch_size])
+            self.stdout.write(f"{min(offset + batch_size, len(drink_ids))}/{len(drink_ids)} drinks")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {saved} similar drinks for {len(drink_ids)} drinks in {elapsed:.1f}s."
+        ))
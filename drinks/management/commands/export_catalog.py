@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from drinks.catalog import FORMATS, iterCatalog, writeCatalog
+
+
+# Streams every drink with its recipe to a JSON Lines or CSV file, in the same
+# formats import_catalog reads
+class Command(BaseCommand):
+    help = "Exports drinks with their recipes to a JSON Lines or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default="-",
+            help="File to write, or - to write to stdout."
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            default=None,
+            help="Format of the file. Defaults to the file's extension."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of drinks read from the database at a time."
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        lines = writeCatalog(iterCatalog(options["chunk_size"]), format)
+
+        if path == "-":
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        try:
+            with open(path, "w", newline="", encoding="utf-8") as output:
+                output.writelines(lines)
+        except OSError as error:
+            raise CommandError(error)
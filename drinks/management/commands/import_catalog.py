@@ -0,0 +1,69 @@
+import sys
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from drinks.catalog import CatalogImporter, FORMATS, InvalidCatalog, readCatalog
+from drinks.indexes import invalidateIndexes
+
+
+# Streams drinks with their recipes from a JSON Lines or CSV file into the catalog.
+# See drinks.catalog for the formats.
+class Command(BaseCommand):
+    help = "Imports drinks, ingredients and recipes from a JSON Lines or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - to read from stdin.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            default=None,
+            help="Format of the file. Defaults to the file's extension."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of drinks saved per transaction."
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        if path == "-":
+            lines = sys.stdin
+        else:
+            try:
+                lines = open(path, newline="", encoding="utf-8")
+            except OSError as error:
+                raise CommandError(error)
+
+        importer = CatalogImporter()
+        drinks = readCatalog(lines, format)
+        start = time.perf_counter()
+        try:
+            while True:
+                batch = list(islice(drinks, options["batch_size"]))
+                if not batch:
+                    break
+                importer.importBatch(batch)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"{importer.drinks} drinks, {importer.recipe_items} recipe items "
+                    f"({importer.drinks / elapsed:.0f} drinks/s)"
+                )
+        except InvalidCatalog as error:
+            raise CommandError(error)
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+
+        # The batches were saved without the signals keeping the indexes current
+        invalidateIndexes()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {importer.drinks} drinks and {importer.recipe_items} recipe items "
+            f"in {time.perf_counter() - start:.1f}s, skipped {importer.skipped} drinks. "
+            "Run compute_similar_drinks to update the similar drinks."
+        ))
+        for record in importer.invalid:
+            self.stdout.write(f"Skipped: {record}")
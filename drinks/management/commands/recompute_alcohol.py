@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from drinks.services import recomputeAlcohol
+
+
+# Repairs the Alcohol flag of every drink in the catalog, writing only the wrong ones
+class Command(BaseCommand):
+    help = "Recomputes the Alcohol flag of every drink from its recipe."
+
+    def handle(self, *args, **options):
+        updated = recomputeAlcohol()
+        self.stdout.write(self.style.SUCCESS(f"Fixed the Alcohol flag of {updated} drinks."))
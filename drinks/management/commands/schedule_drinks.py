@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from drinks.services import scheduleDrinkOfTheDay
+
+
+# Fills the drink of the day schedule so that the home page only has to look it up.
+# Run it daily (e.g. from cron shortly after midnight). Days scheduled further ahead
+# only consider the drinks that exist when the command runs.
+class Command(BaseCommand):
+    help = "Schedules the drink of the day for today and the following days."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=1,
+            help="Number of days to schedule, starting from the start date."
+        )
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            default=None,
+            help="First day to schedule (YYYY-MM-DD). Defaults to today."
+        )
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Pick the drinks again for days that are already scheduled."
+        )
+
+    def handle(self, *args, **options):
+        start = options["start"] or date.today()
+        for offset in range(options["days"]):
+            day = start + timedelta(days=offset)
+            scheduled = scheduleDrinkOfTheDay(day, refresh=options["refresh"])
+            if scheduled:
+                self.stdout.write(f"{day}: {scheduled.Drink}")
+            else:
+                self.stdout.write(self.style.WARNING(f"{day}: no drinks are available"))
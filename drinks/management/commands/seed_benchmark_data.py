@@ -0,0 +1,132 @@
+import random
+import time
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from drinks.cache import bumpCatalogVersion
+from drinks.catalog import CatalogImporter
+from drinks.indexes import invalidateIndexes
+from drinks.models import DRINK_TYPES, Ingredient
+from users.models import Profile
+
+DRINK_WORDS = [
+    "Blue", "Frozen", "Golden", "Spiced", "Midnight", "Tropical", "Smoky", "Sour",
+    "Royal", "Wild", "Velvet", "Iced", "Mule", "Fizz", "Sling", "Punch", "Cooler",
+    "Flip", "Smash", "Julep", "Sunrise", "Breeze", "Storm", "Lagoon",
+]
+INGREDIENT_WORDS = [
+    "Vodka", "Gin", "Rum", "Tequila", "Whiskey", "Brandy", "Vermouth", "Bitters",
+    "Lime", "Lemon", "Orange", "Pineapple", "Cranberry", "Mint", "Sugar", "Syrup",
+    "Soda", "Tonic", "Cola", "Cream", "Milk", "Coffee", "Tea", "Ginger",
+]
+ALCOHOLIC_WORDS = {"Vodka", "Gin", "Rum", "Tequila", "Whiskey", "Brandy", "Vermouth", "Bitters"}
+MEASUREMENTS = ["oz", "cl", "tsp", "tbsp", "dash", "cup", "shot", "splash"]
+QUANTITIES = ["0.25", "0.50", "0.75", "1.00", "1.50", "2.00", "3.00"]
+
+
+# Fills the database with generated drinks, ingredients, recipes and users for
+# benchmarking. Drinks go through the catalog importer, so they're saved the same
+# way as imported ones. A few ingredients are used by most drinks, like in a real
+# catalog, and the number of recipe items per drink varies around the average.
+class Command(BaseCommand):
+    help = "Generates drinks, ingredients, recipes and users for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drinks", type=int, default=1000, help="Number of drinks.")
+        parser.add_argument("--ingredients", type=int, default=200, help="Number of ingredients.")
+        parser.add_argument("--users", type=int, default=100, help="Number of users with profiles.")
+        parser.add_argument(
+            "--recipe-size",
+            type=float,
+            default=5,
+            help="Average number of recipe items per drink."
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of rows saved per query."
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        self.random = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+
+        ingredients = self.seedIngredients(options["ingredients"], batch_size)
+        self.cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(ingredients))))
+        importer = CatalogImporter()
+        number_of_drinks = options["drinks"]
+        for offset in range(0, number_of_drinks, batch_size):
+            importer.importBatch([
+                self.makeDrink(index, ingredients, options["recipe_size"])
+                for index in range(offset, min(offset + batch_size, number_of_drinks))
+            ])
+            self.stdout.write(f"{importer.drinks}/{number_of_drinks} drinks")
+        users = self.seedUsers(options["users"], batch_size)
+
+        # The indexes and cached pages still show the catalog from before the seed
+        invalidateIndexes()
+        bumpCatalogVersion()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {len(ingredients)} ingredients, {importer.drinks} drinks, "
+            f"{importer.recipe_items} recipe items and {users} users "
+            f"in {time.perf_counter() - start:.1f}s."
+        ))
+
+    def seedIngredients(self, number_of_ingredients, batch_size):
+        ingredients = []
+        for index in range(number_of_ingredients):
+            word = INGREDIENT_WORDS[index % len(INGREDIENT_WORDS)]
+            ingredients.append(Ingredient(Name=f"{word} {index:06}", Alcohol=word in ALCOHOLIC_WORDS))
+        Ingredient.objects.bulk_create(ingredients, batch_size=batch_size, ignore_conflicts=True)
+        return [
+            (ingredient.Name, ingredient.Alcohol) for ingredient in ingredients
+        ]
+
+    # Ingredients are picked with weights following Zipf's law
+    def makeDrink(self, index, ingredients, recipe_size):
+        size = max(1, min(len(ingredients), round(self.random.gauss(recipe_size, recipe_size / 3))))
+        picked = {}
+        while len(picked) < size:
+            name, alcohol = self.random.choices(ingredients, cum_weights=self.cum_weights)[0]
+            picked[name] = alcohol
+
+        words = self.random.sample(DRINK_WORDS, 2)
+        return {
+            "Name": f"{words[0]} {words[1]} {index:07}",
+            "Type": self.random.choice(DRINK_TYPES)[0],
+            "Recipe": [
+                {
+                    "Ingredient": name,
+                    "Alcohol": alcohol,
+                    "Quantity": self.random.choice(QUANTITIES),
+                    "Measurement": self.random.choice(MEASUREMENTS),
+                }
+                for name, alcohol in picked.items()
+            ],
+        }
+
+    # Every user gets the same password, which is only hashed once
+    def seedUsers(self, number_of_users, batch_size):
+        password = make_password("benchmark")
+        existing = set(User.objects.values_list("username", flat=True))
+        users = [
+            User(username=f"benchmark{index:07}", email=f"benchmark{index:07}@example.com", password=password)
+            for index in range(number_of_users)
+            if f"benchmark{index:07}" not in existing
+        ]
+        User.objects.bulk_create(users, batch_size=batch_size)
+        Profile.objects.bulk_create(
+            [
+                Profile(user_id=pk)
+                for pk in User.objects.filter(
+                    username__startswith="benchmark", profile__isnull=True
+                ).values_list("pk", flat=True)
+            ],
+            batch_size=batch_size
+        )
+        return len(users)
@@ -0,0 +1,25 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drinks', '0006_auto_20201013_0059'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DrinkOfTheDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Date', models.DateField(unique=True)),
+                ('Drink', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='drinks.drink')),
+            ],
+            options={
+                'ordering': ['Date'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    # Used by the % (trigram similarity) operator
+    ("drinks_drink_name_trgm", "drinks_drink", '"Name" gin_trgm_ops'),
+    ("drinks_ingredient_name_trgm", "drinks_ingredient", '"Name" gin_trgm_ops'),
+    # Used by icontains, which compares UPPER("Name") on PostgreSQL
+    ("drinks_drink_name_upper_trgm", "drinks_drink", 'UPPER("Name"::text) gin_trgm_ops'),
+    ("drinks_ingredient_name_upper_trgm", "drinks_ingredient", 'UPPER("Name"::text) gin_trgm_ops'),
+]
+
+
+# pg_trgm only exists on PostgreSQL. Other databases search without these indexes.
+def createTrigramIndexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" USING gin ({expression})'
+        )
+
+
+def dropTrigramIndexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, table, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drinks', '0007_drinkoftheday'),
+    ]
+
+    operations = [
+        migrations.RunPython(createTrigramIndexes, dropTrigramIndexes),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drinks', '0008_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarDrink',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Score', models.FloatField()),
+                ('Drink', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_drinks', to='drinks.drink')),
+                ('Similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='drinks.drink')),
+            ],
+            options={
+                'ordering': ['-Score', 'Similar'],
+                'unique_together': {('Drink', 'Similar')},
+            },
+        ),
+    ]
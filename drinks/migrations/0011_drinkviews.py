@@ -0,0 +1,24 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drinks', '0010_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DrinkViews',
+            fields=[
+                ('Drink', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='view_count', serialize=False, to='drinks.drink')),
+                ('Views', models.PositiveBigIntegerField(db_index=True, default=0)),
+            ],
+            options={
+                'ordering': ['-Views'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('drinks', '0011_drinkviews'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Favorite',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Created', models.DateTimeField(auto_now_add=True)),
+                ('Drink', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorited_by', to='drinks.drink')),
+                ('User', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['User', 'Drink'],
+                'unique_together': {('User', 'Drink')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+# Fills in the usage counts of the existing ingredients with one UPDATE
+def countIngredientUsage(apps, schema_editor):
+    Ingredient = apps.get_model("drinks", "Ingredient")
+    Recipe = apps.get_model("drinks", "Recipe")
+    usage = Recipe.objects.filter(Ingredient=OuterRef("pk")).order_by().values("Ingredient").annotate(
+        count=Count("pk")
+    ).values("count")
+    Ingredient.objects.update(UsageCount=Coalesce(Subquery(usage), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drinks', '0012_favorite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='UsageCount',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['Ingredient', 'Drink'], name='recipe_ingredient_drink'),
+        ),
+        migrations.RunPython(countIngredientUsage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drinks', '0013_ingredient_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drink',
+            name='SimilarStale',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+    ]
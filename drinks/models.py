@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.auth.models import User
 from django.urls import reverse
 from django.core.validators import MinValueValidator, RegexValidator
 from django.utils import timezone
@@ -43,6 +44,9 @@ class Drink(models.Model):
     )
     Alcohol = models.BooleanField(null = False, default = False)
     Datestamp = models.DateField(null = False, default=timezone.now)
+    Modified = models.DateTimeField(null = False, auto_now = True)
+    # Whether the stored similar drinks may be out of date with the recipes
+    SimilarStale = models.BooleanField(null = False, default = False, editable = False, db_index = True)
 
     class Meta:
         ordering = ['Name']
@@ -67,6 +71,9 @@ class Ingredient(models.Model):
         ]
     )
     Alcohol = models.BooleanField(null = False, default = False)
+    Modified = models.DateTimeField(null = False, auto_now = True)
+    # Number of recipe items using the ingredient, recounted whenever they change
+    UsageCount = models.PositiveIntegerField(null = False, default = 0, editable = False)
 
     class Meta:
         ordering = ['Name']
@@ -99,11 +106,85 @@ class Recipe(models.Model):
         ]
     )
  
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._saved_ingredient_id = None
+
+    # The ingredient the item had when it was loaded, whose usage changes if another
+    # one is saved
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_ingredient_id = instance.__dict__.get("Ingredient_id")
+        return instance
+
     class Meta:
         unique_together = (("Drink", "Ingredient"),)
+        # Reads the drinks using an ingredient in order of their pk
+        indexes = [models.Index(fields=["Ingredient", "Drink"], name="recipe_ingredient_drink")]
 
     def get_absolute_url(self):
         return reverse("drink-detail", kwargs={"pk": self.Drink.pk})
     
     def __str__(self):
         return f"{self.Drink.Name}: {self.Quantity} {self.Measurement} {self.Ingredient.Name}"
+
+
+class DrinkOfTheDay(models.Model):
+    Date = models.DateField(unique = True, null = False)
+    Drink = models.ForeignKey(Drink, null = False, on_delete = models.CASCADE)
+
+    class Meta:
+        ordering = ['Date']
+
+    def __str__(self):
+        return f'{self.Date}: {self.Drink.Name}'
+
+
+class SimilarDrink(models.Model):
+    Drink = models.ForeignKey(
+        Drink,
+        null = False,
+        on_delete = models.CASCADE,
+        related_name = "similar_drinks"
+    )
+    Similar = models.ForeignKey("Drink", null = False, on_delete = models.CASCADE, related_name = "+")
+    Score = models.FloatField(null = False)
+
+    class Meta:
+        ordering = ['-Score', 'Similar']
+        unique_together = (("Drink", "Similar"),)
+
+    def __str__(self):
+        return f'{self.Drink.Name} ~ {self.Similar.Name}: {self.Score:.2f}'
+
+
+# Number of times the page of a drink was opened, written in batches by the
+# view counter rather than on every request
+class DrinkViews(models.Model):
+    Drink = models.OneToOneField(
+        Drink,
+        primary_key = True,
+        on_delete = models.CASCADE,
+        related_name = "view_count"
+    )
+    Views = models.PositiveBigIntegerField(default = 0, db_index = True)
+
+    class Meta:
+        ordering = ['-Views']
+
+    def __str__(self):
+        return f'{self.Drink.Name}: {self.Views}'
+
+
+class Favorite(models.Model):
+    User = models.ForeignKey(User, null = False, on_delete = models.CASCADE, related_name = "favorites")
+    Drink = models.ForeignKey(Drink, null = False, on_delete = models.CASCADE, related_name = "favorited_by")
+    Created = models.DateTimeField(null = False, auto_now_add = True)
+
+    class Meta:
+        ordering = ['User', 'Drink']
+        unique_together = (("User", "Drink"),)
+
+    def __str__(self):
+        return f'{self.User.username}: {self.Drink.Name}'
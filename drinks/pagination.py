@@ -0,0 +1,155 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+NEXT = "next"
+PREVIOUS = "previous"
+
+# Bounds of the 64-bit integer columns of the databases
+MIN_INTEGER = -2 ** 63
+MAX_INTEGER = 2 ** 63 - 1
+
+
+# Cursors are opaque tokens holding the sort key of the row to continue from
+# and the direction to read in. A cursor without a key starts from the end.
+def encodeCursor(key, direction):
+    data = json.dumps([key, direction], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def isSortValue(value):
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def isInteger(value):
+    return isinstance(value, int) and not isinstance(value, bool) and MIN_INTEGER <= value <= MAX_INTEGER
+
+
+# Returns the key and direction of a cursor, or None if the cursor is invalid.
+# Cursors come from the querystring, so anything but a key made of a sort value
+# and an integer pk is rejected before it reaches a query.
+def decodeCursor(cursor):
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, direction = json.loads(data)
+        if direction not in (NEXT, PREVIOUS):
+            return None
+        if key is not None:
+            value, pk = key
+            if not isSortValue(value) or not isInteger(pk):
+                return None
+    except (TypeError, ValueError):
+        return None
+    return key, direction
+
+
+# Returns the key with its sort value converted for the field the rows are
+# ordered by, or None if the value can't be compared with that field
+def cleanCursorKey(model, field, key):
+    model_field = model._meta.get_field(field)
+    try:
+        value = model_field.get_prep_value(model_field.to_python(key[0]))
+    except (ValidationError, TypeError, ValueError, OverflowError):
+        return None
+    if isinstance(value, int) and not isInteger(value):
+        return None
+    return [value, key[1]]
+
+
+# A page of results read with keyset pagination. Unlike Django's Page it knows
+# nothing about the total number of results, only whether there are more around it.
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.last_cursor = encodeCursor(None, PREVIOUS)
+
+    def __repr__(self):
+        return f"<KeysetPage of {len(self.object_list)} items>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+# Reads one page of the queryset ordered by (field, pk), starting after the row in
+# the cursor. Only page_size + 1 rows are fetched, so no COUNT or OFFSET is needed.
+def paginateByCursor(queryset, field, page_size, cursor=None):
+    key, direction = None, NEXT
+    if cursor:
+        key, direction = decodeCursor(cursor) or (None, NEXT)
+    if key is not None:
+        key = cleanCursorKey(queryset.model, field, key)
+        if key is None:
+            direction = NEXT
+
+    if direction == PREVIOUS:
+        queryset = queryset.order_by(f"-{field}", "-pk")
+        if key is not None:
+            queryset = queryset.filter(
+                Q(**{f"{field}__lt": key[0]}) | Q(**{field: key[0], "pk__lt": key[1]})
+            )
+        rows = list(queryset[:page_size + 1])
+        has_previous = len(rows) > page_size
+        has_next = key is not None
+        rows = rows[:page_size][::-1]
+    else:
+        queryset = queryset.order_by(field, "pk")
+        if key is not None:
+            queryset = queryset.filter(
+                Q(**{f"{field}__gt": key[0]}) | Q(**{field: key[0], "pk__gt": key[1]})
+            )
+        rows = list(queryset[:page_size + 1])
+        has_next = len(rows) > page_size
+        has_previous = key is not None
+        rows = rows[:page_size]
+
+    next_cursor = previous_cursor = None
+    if rows and has_next:
+        next_cursor = encodeCursor([getattr(rows[-1], field), rows[-1].pk], NEXT)
+    if rows and has_previous:
+        previous_cursor = encodeCursor([getattr(rows[0], field), rows[0].pk], PREVIOUS)
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+# Paginates a ListView by cursor on (cursor_field, pk) instead of by page number.
+# Views that only list small result sets can set pagination_mode = "page".
+class KeysetPaginationMixin:
+    pagination_mode = "keyset"
+    cursor_field = "Name"
+    cursor_kwarg = "cursor"
+    search_parameter = None
+
+    # Searches are ranked by relevance, so they're paginated by page number
+    def get_pagination_mode(self):
+        if self.search_parameter and self.request.GET.get(self.search_parameter):
+            return "page"
+        return self.pagination_mode
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() != "keyset":
+            return super().paginate_queryset(queryset, page_size)
+
+        page = paginateByCursor(
+            queryset,
+            self.cursor_field,
+            page_size,
+            self.request.GET.get(self.cursor_kwarg)
+        )
+        return (None, page, page.object_list, page.has_other_pages())
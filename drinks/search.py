@@ -0,0 +1,34 @@
+from django.db import connections
+from django.db.models import CharField, Q
+
+
+def usesTrigrams(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+# django.contrib.postgres needs psycopg2, so its lookups are only registered
+# once a PostgreSQL database is actually being searched.
+def registerTrigramLookups():
+    if "trigram_similar" not in CharField.get_lookups():
+        from django.contrib.postgres.lookups import TrigramSimilar
+        CharField.register_lookup(TrigramSimilar)
+
+
+# Filters the queryset to the rows whose field contains or resembles the value.
+# On PostgreSQL both conditions use the pg_trgm GIN indexes, so names within
+# pg_trgm.similarity_threshold (0.3 by default) of the value match despite typos,
+# and the results are ranked by similarity. Other databases fall back to icontains.
+def searchByName(queryset, field, value):
+    if not value:
+        return queryset
+
+    if not usesTrigrams(queryset):
+        return queryset.filter(**{f"{field}__icontains": value})
+
+    from django.contrib.postgres.search import TrigramSimilarity
+    registerTrigramLookups()
+    return queryset.filter(
+        Q(**{f"{field}__icontains": value}) | Q(**{f"{field}__trigram_similar": value})
+    ).annotate(
+        rank=TrigramSimilarity(field, value)
+    ).order_by("-rank", field)
@@ -0,0 +1,233 @@
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Drink, Ingredient, Recipe, DrinkOfTheDay, SimilarDrink, Favorite
+from .cache import catalogChanged, getCacheTimeout
+from .indexes import recipeIndex
+
+# No drinks were saved prior to this date
+FIRST_DRINK_DATE = date(2020, 1, 1)
+
+# Number of similar drinks stored for every drink
+SIMILAR_DRINKS = 5
+
+# Drinks are updated in chunks of this size to stay within query parameter limits
+DRINK_CHUNK_SIZE = 500
+
+# Largest number of changed recipes whose similar drinks are scored again as soon
+# as they're saved. Scoring a drink reads the posting lists of all its ingredients.
+SIMILAR_DRINKS_SYNC_LIMIT = 5
+
+
+# Returns the index of the drink of the day using modular exponentation on the date.
+# The result is reduced to the number of drinks available on that date.
+def getDrinkOfTheDayIndex(day, number_of_drinks):
+    return pow(
+        int(day.strftime("%Y%m%d")),
+        3540034045828155908745054744418277834243309928115463377391493476491109069681,
+        72437346919515671440505456097276374932311092479844125795754094155925023764307
+    ) % number_of_drinks
+
+
+# Picks the drink of the day from the drinks made prior to the given day.
+# Returns None if no drinks are available.
+def pickDrinkOfTheDay(day):
+    drink_keys = Drink.objects.filter(
+        Datestamp__range=[FIRST_DRINK_DATE, day - timedelta(days=1)]
+    ).order_by("pk").values_list("pk", flat=True)
+
+    number_of_drinks = drink_keys.count()
+    if not number_of_drinks:
+        return None
+    return Drink.objects.get(pk=drink_keys[getDrinkOfTheDayIndex(day, number_of_drinks)])
+
+
+# Saves the drink of the day for the given day unless one is already scheduled.
+# Passing refresh=True picks the drink again and replaces the scheduled one.
+def scheduleDrinkOfTheDay(day, refresh=False):
+    if not refresh:
+        scheduled = DrinkOfTheDay.objects.select_related("Drink").filter(Date=day).first()
+        if scheduled:
+            return scheduled
+
+    drink = pickDrinkOfTheDay(day)
+    if drink is None:
+        return None
+
+    # Concurrent requests may schedule the same day, so the first one saved wins
+    if refresh:
+        scheduled, _ = DrinkOfTheDay.objects.update_or_create(Date=day, defaults={"Drink": drink})
+    else:
+        scheduled, _ = DrinkOfTheDay.objects.get_or_create(Date=day, defaults={"Drink": drink})
+    return scheduled
+
+
+# Returns the drink of the day with a single keyed lookup on the schedule.
+# The first request of a day that hasn't been scheduled ahead of time fills it in.
+def getDrinkOfTheDay(day=None):
+    scheduled = scheduleDrinkOfTheDay(day or date.today())
+    return scheduled.Drink if scheduled else None
+
+
+# Recomputes the Alcohol flag of the given drinks with one UPDATE per direction.
+# A drink contains alcohol if any ingredient in its recipe does. The recipe items
+# of excluded_ingredient are ignored, which allows recomputing before it's deleted.
+# Only the drinks whose flag changes are written and marked as modified, so the
+# catalog caches survive when nothing did. Returns the number of changed drinks.
+def recomputeAlcohol(drinks=None, excluded_ingredient=None):
+    if drinks is None:
+        drinks = Drink.objects.all()
+
+    alcoholic_items = Recipe.objects.filter(Drink=OuterRef("pk"), Ingredient__Alcohol=True)
+    if excluded_ingredient is not None:
+        alcoholic_items = alcoholic_items.exclude(Ingredient=excluded_ingredient)
+
+    now = timezone.now()
+    drinks = drinks.order_by()
+    updated = drinks.filter(Exists(alcoholic_items), Alcohol=False).update(Alcohol=True, Modified=now)
+    updated += drinks.filter(~Exists(alcoholic_items), Alcohol=True).update(Alcohol=False, Modified=now)
+    if updated:
+        catalogChanged()
+    return updated
+
+
+# Returns the drinks that have the ingredient in their recipe
+def getDrinksUsingIngredient(ingredient):
+    return Drink.objects.filter(pk__in=Recipe.objects.filter(Ingredient=ingredient).values("Drink"))
+
+
+# Marks the drinks using the ingredient as modified, as their recipes show its name
+def touchDrinksUsingIngredient(ingredient):
+    return getDrinksUsingIngredient(ingredient).update(Modified=timezone.now())
+
+
+# Sets the UsageCount of the ingredients, or of all of them, to the number of
+# recipe items using them. Each chunk is counted from the index on Recipe.Ingredient
+# in a single UPDATE.
+def recountIngredientUsage(ingredient_ids=None):
+    usage = Recipe.objects.filter(Ingredient=OuterRef("pk")).order_by().values("Ingredient").annotate(
+        count=Count("pk")
+    ).values("count")
+    if ingredient_ids is None:
+        return Ingredient.objects.update(UsageCount=Coalesce(Subquery(usage), 0))
+
+    ingredient_ids = sorted(set(ingredient_ids))
+    for start in range(0, len(ingredient_ids), DRINK_CHUNK_SIZE):
+        Ingredient.objects.filter(pk__in=ingredient_ids[start:start + DRINK_CHUNK_SIZE]).update(
+            UsageCount=Coalesce(Subquery(usage), 0)
+        )
+
+
+def getFavoritesCacheKey(user):
+    return f"drinks:favorites:{user.pk}"
+
+
+# Returns the set of the pks of the favorite drinks of the user, so list pages can
+# star every drink without a query per row. The set is cached until it changes.
+def getFavoriteDrinkIds(user):
+    if not user.is_authenticated:
+        return set()
+    key = getFavoritesCacheKey(user)
+    drink_ids = cache.get(key)
+    if drink_ids is None:
+        drink_ids = set(Favorite.objects.filter(User=user).values_list("Drink_id", flat=True))
+        cache.set(key, drink_ids, getCacheTimeout())
+    return drink_ids
+
+
+# Adds the drink to the favorites of the user, or removes it if it was one.
+# Returns whether the drink is now a favorite.
+def toggleFavorite(user, drink):
+    deleted, _ = Favorite.objects.filter(User=user, Drink=drink).delete()
+    if not deleted:
+        Favorite.objects.get_or_create(User=user, Drink=drink)
+    cache.delete(getFavoritesCacheKey(user))
+    return not deleted
+
+
+# Counts the drinks of the queryset for every combination of Type and Alcohol
+# with a single GROUP BY. Returns {(type, alcohol): count}.
+def countDrinksByFacet(drinks):
+    return {
+        (row["Type"], row["Alcohol"]): row["count"]
+        for row in drinks.order_by().values("Type", "Alcohol").annotate(count=Count("pk"))
+    }
+
+
+# Replaces the stored similar drinks of the given drinks with the top matches
+# from the recipe index. Returns the number of rows saved.
+def saveSimilarDrinks(drink_ids):
+    matches = {drink_id: recipeIndex.similar(drink_id, SIMILAR_DRINKS) for drink_id in drink_ids}
+
+    # Drinks deleted in a transaction that's being committed may still be indexed
+    referenced = set(drink_ids)
+    for similar in matches.values():
+        referenced.update(similar_id for similar_id, score in similar)
+    existing = set(Drink.objects.filter(pk__in=referenced).values_list("pk", flat=True))
+
+    rows = [
+        SimilarDrink(Drink_id=drink_id, Similar_id=similar_id, Score=score)
+        for drink_id, similar in matches.items() if drink_id in existing
+        for similar_id, score in similar if similar_id in existing
+    ]
+    with transaction.atomic():
+        SimilarDrink.objects.filter(Drink_id__in=drink_ids).delete()
+        SimilarDrink.objects.bulk_create(rows)
+        Drink.objects.filter(pk__in=drink_ids, SimilarStale=True).update(SimilarStale=False)
+    catalogChanged()
+    return len(rows)
+
+
+# Flags the drinks whose recipe changed, and the drinks that currently list them,
+# for compute_similar_drinks --stale to score again. Drinks that would newly rank
+# one of them in their top matches pick it up on its next full run.
+def markSimilarDrinksStale(drink_ids):
+    listed_by = SimilarDrink.objects.filter(Similar_id__in=drink_ids).values("Drink_id")
+    return Drink.objects.filter(Q(pk__in=drink_ids) | Q(pk__in=listed_by)).update(SimilarStale=True)
+
+
+# Saves a valid recipe formset with a query per kind of change rather than per
+# line, then recomputes the Alcohol of the drink and the usage of the ingredients
+# once. bulk_create and bulk_update send no signals, so the caller has to report
+# the change of the recipe.
+def saveRecipeFormset(formset):
+    items = formset.save(commit=False)
+    # bulk_update writes one row at a time, so lines swapping their ingredients
+    # would collide on (Drink, Ingredient). Lines changing their ingredient are
+    # deleted and inserted again instead.
+    moved = [item for item in items if item.pk is not None and item.Ingredient_id != item._saved_ingredient_id]
+    deleted = [item.pk for item in formset.deleted_objects + moved]
+    if deleted:
+        Recipe.objects.filter(pk__in=deleted).delete()
+    for item in moved:
+        item.pk = None
+    Recipe.objects.bulk_update(
+        [item for item in items if item.pk is not None],
+        ["Quantity", "Measurement"]
+    )
+    Recipe.objects.bulk_create([item for item in items if item.pk is None])
+    recomputeAlcohol(Drink.objects.filter(pk=formset.instance.pk))
+    recountIngredientUsage({
+        pk
+        for item in items + formset.deleted_objects
+        for pk in (item.Ingredient_id, item._saved_ingredient_id) if pk
+    })
+
+
+# Brings everything derived from the recipes of the given drinks up to date: the
+# recipe index, the similar drinks and the Modified time used by the API.
+def recipesChanged(drink_ids):
+    drink_ids = sorted(set(drink_ids))
+    for start in range(0, len(drink_ids), DRINK_CHUNK_SIZE):
+        chunk = drink_ids[start:start + DRINK_CHUNK_SIZE]
+        recipeIndex.refreshDrinks(chunk)
+        markSimilarDrinksStale(chunk)
+        Drink.objects.filter(pk__in=chunk).update(Modified=timezone.now())
+
+    # A few edited recipes show their new similar drinks right away, while bulk
+    # changes like deleting a popular ingredient are left to the command
+    if len(drink_ids) <= SIMILAR_DRINKS_SYNC_LIMIT:
+        saveSimilarDrinks(drink_ids)
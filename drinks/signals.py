@@ -0,0 +1,81 @@
+import threading
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import bumpCatalogVersion
+from .indexes import drinkNames, ingredientNames
+from .models import Drink, Ingredient, Recipe
+from .services import recipesChanged, recountIngredientUsage, touchDrinksUsingIngredient
+
+
+# Changes made by the current transaction of this thread
+class PendingChanges(threading.local):
+    def __init__(self):
+        self.drink_ids = set()
+        self.ingredient_ids = set()
+        self.catalog = False
+
+
+pending = PendingChanges()
+
+
+# Deleting an ingredient or a drink deletes many recipe items at once, so the
+# changes are collected and applied together once they've been committed. The
+# first callback does the work and the others find nothing left to do.
+def flushPendingChanges():
+    drink_ids, pending.drink_ids = pending.drink_ids, set()
+    ingredient_ids, pending.ingredient_ids = pending.ingredient_ids, set()
+    catalog, pending.catalog = pending.catalog, False
+    if drink_ids:
+        recipesChanged(drink_ids)
+    if ingredient_ids:
+        recountIngredientUsage(ingredient_ids)
+    if catalog:
+        bumpCatalogVersion()
+
+
+# Queues a change of the catalog, and of the recipe of the drink if one is given,
+# to be applied once the transaction commits. Code saving recipe items without
+# signals, like bulk_create, calls it itself.
+def queueCatalogChange(drink_id=None):
+    if drink_id is not None:
+        pending.drink_ids.add(drink_id)
+    pending.catalog = True
+    transaction.on_commit(flushPendingChanges)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def changeRecipe(sender, instance, **kwargs):
+    # Both the ingredient the item had and the one it has now changed usage
+    pending.ingredient_ids.update(
+        pk for pk in (instance.Ingredient_id, instance._saved_ingredient_id) if pk
+    )
+    instance._saved_ingredient_id = instance.Ingredient_id
+    queueCatalogChange(instance.Drink_id)
+
+
+@receiver(post_save, sender=Drink)
+def saveDrink(sender, instance, **kwargs):
+    transaction.on_commit(lambda: drinkNames.update(instance.pk, instance.Name))
+    queueCatalogChange()
+
+
+@receiver(post_delete, sender=Drink)
+def deleteDrink(sender, instance, **kwargs):
+    transaction.on_commit(lambda: drinkNames.remove(instance.pk))
+    queueCatalogChange()
+
+
+@receiver(post_save, sender=Ingredient)
+def saveIngredient(sender, instance, created, **kwargs):
+    if not created:
+        touchDrinksUsingIngredient(instance)
+    transaction.on_commit(lambda: ingredientNames.update(instance.pk, instance.Name))
+    queueCatalogChange()
+
+
+@receiver(post_delete, sender=Ingredient)
+def deleteIngredient(sender, instance, **kwargs):
+    transaction.on_commit(lambda: ingredientNames.remove(instance.pk))
+    queueCatalogChange()
@@ -0,0 +1,53 @@
+// Adds a search box above every select with a data-autocomplete-url. Typing in it
+// replaces the options of the select with the matches from the endpoint, which
+// returns {"results": [{"id": ..., "text": ...}, ...]}. Selected options are kept.
+(function () {
+    var DELAY = 200;
+
+    function setUp(select) {
+        var input = document.createElement("input");
+        input.type = "search";
+        input.className = "form-control mb-2";
+        input.placeholder = "Type to search...";
+        input.setAttribute("autocomplete", "off");
+        select.parentNode.insertBefore(input, select);
+
+        var timer = null;
+        var request = 0;
+        input.addEventListener("input", function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                var current = ++request;
+                var url = select.dataset.autocompleteUrl + "?q=" + encodeURIComponent(input.value);
+                fetch(url, { credentials: "same-origin" })
+                    .then(function (response) { return response.json(); })
+                    .then(function (data) {
+                        // Responses of earlier keystrokes may arrive late
+                        if (current === request) {
+                            showResults(select, data.results);
+                        }
+                    });
+            }, DELAY);
+        });
+    }
+
+    function showResults(select, results) {
+        var kept = {};
+        Array.prototype.slice.call(select.options).forEach(function (option) {
+            if (option.selected && option.value) {
+                kept[option.value] = true;
+            } else if (option.value) {
+                select.removeChild(option);
+            }
+        });
+        results.forEach(function (result) {
+            if (!kept[result.id]) {
+                select.appendChild(new Option(result.text, result.id));
+            }
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("select[data-autocomplete-url]").forEach(setUp);
+    });
+})();
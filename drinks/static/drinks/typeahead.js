@@ -0,0 +1,52 @@
+// Suggests drinks below every input with a data-typeahead-url as the user types.
+// The endpoint returns {"results": [{"id": ..., "text": ..., "url": ...}, ...]}
+// and every suggestion links to its drink. Submitting the form still searches.
+(function () {
+    var DELAY = 100;
+
+    function setUp(input) {
+        var menu = input.parentNode.querySelector(".dropdown-menu");
+        var timer = null;
+        var request = 0;
+
+        input.addEventListener("input", function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                var current = ++request;
+                if (!input.value.trim()) {
+                    menu.classList.remove("show");
+                    return;
+                }
+                fetch(input.dataset.typeaheadUrl + "?q=" + encodeURIComponent(input.value))
+                    .then(function (response) { return response.json(); })
+                    .then(function (data) {
+                        // Responses of earlier keystrokes may arrive late
+                        if (current === request) {
+                            showResults(menu, data.results);
+                        }
+                    });
+            }, DELAY);
+        });
+
+        input.addEventListener("blur", function () {
+            // Let a click on a suggestion go through first
+            setTimeout(function () { menu.classList.remove("show"); }, 200);
+        });
+    }
+
+    function showResults(menu, results) {
+        menu.innerHTML = "";
+        results.forEach(function (result) {
+            var link = document.createElement("a");
+            link.className = "dropdown-item";
+            link.href = result.url;
+            link.textContent = result.text;
+            menu.appendChild(link);
+        });
+        menu.classList.toggle("show", results.length > 0);
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("input[data-typeahead-url]").forEach(setUp);
+    });
+})();
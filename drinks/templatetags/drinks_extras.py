@@ -2,14 +2,45 @@ from django import template
 
 register = template.Library()
 
-@register.simple_tag
-def search_url(value, field_name, urlencode=None):
-    url = "?{}={}".format(field_name, value)
-
-    if urlencode:
-        querystring = urlencode.split('&')
-        filtered_querystring = filter(lambda p: p.split('=')[0] != field_name, querystring)
-        encoded_querystring = '&'.join(filtered_querystring)
-        url = "{}&{}".format(url, encoded_querystring)
-    
-    return url
\ No newline at end of file
+# Renders the pagination links of a list view. Only the links around the current
+# page are built, each from a copy of the parsed querystring with the page replaced.
+@register.inclusion_tag("drinks/pagination.html", takes_context=True)
+def pagination(context, window=2):
+    page_obj = context.get("page_obj")
+    if not context.get("is_paginated") or page_obj is None:
+        return { "links": [] }
+
+    view = context.get("view")
+    page_kwarg = getattr(view, "page_kwarg", "page")
+    cursor_kwarg = getattr(view, "cursor_kwarg", "cursor")
+    querystring = context["request"].GET.copy()
+    querystring.pop(page_kwarg, None)
+    querystring.pop(cursor_kwarg, None)
+
+    def link(label, field_name=None, value=None, active=False):
+        params = querystring.copy()
+        if field_name:
+            params[field_name] = value
+        return { "label": label, "url": f"?{params.urlencode()}", "active": active }
+
+    links = []
+    if context.get("paginator") is None:
+        # Pages read by cursor only know their neighbours
+        if page_obj.has_previous():
+            links.append(link("First"))
+            links.append(link("Previous", cursor_kwarg, page_obj.previous_cursor))
+        if page_obj.has_next():
+            links.append(link("Next", cursor_kwarg, page_obj.next_cursor))
+            links.append(link("Last", cursor_kwarg, page_obj.last_cursor))
+    else:
+        number = page_obj.number
+        num_pages = page_obj.paginator.num_pages
+        if page_obj.has_previous():
+            links.append(link("First", page_kwarg, 1))
+            links.append(link("Previous", page_kwarg, page_obj.previous_page_number()))
+        for page in range(max(1, number - window), min(num_pages, number + window) + 1):
+            links.append(link(page, page_kwarg, page, active=page == number))
+        if page_obj.has_next():
+            links.append(link("Next", page_kwarg, page_obj.next_page_number()))
+            links.append(link("Last", page_kwarg, num_pages))
+    return { "links": links }
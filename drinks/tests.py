@@ -1,3 +1,671 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import tempfile
+from datetime import date
+from io import StringIO
+from unittest import mock, skipUnless
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from DrinkHub.testing import QueryBudgetTestCase
+from .catalog import FORMATS
+from .counters import ViewCounter, viewCounter
+from .indexes import INDEX_SYNC_INTERVAL, RecipeIndex, invalidateIndexes, recipeIndex
+from .models import Drink, Ingredient, Recipe, DrinkOfTheDay, SimilarDrink, DrinkViews
+from .search import searchByName
+from .services import (
+    FIRST_DRINK_DATE, SIMILAR_DRINKS, getDrinkOfTheDay, recipesChanged, recomputeAlcohol,
+    recountIngredientUsage, scheduleDrinkOfTheDay
+)
 
-# Create your tests here.
+# Several pages of drinks with full recipes, so a query per row can't go unnoticed
+NUMBER_OF_DRINKS = 150
+NUMBER_OF_INGREDIENTS = 60
+RECIPE_SIZE = 5
+SEEDED_TYPES = ["Cocktail", "Shot", "Beer", "Punch/Party Drink"]
+
+
+def seedCatalog():
+    Ingredient.objects.bulk_create([
+        Ingredient(Name=f"Ingredient {i:03}", Alcohol=i % 10 == 0)
+        for i in range(NUMBER_OF_INGREDIENTS)
+    ])
+    Drink.objects.bulk_create([
+        Drink(Name=f"Drink {i:03}", Type=SEEDED_TYPES[i % len(SEEDED_TYPES)], Datestamp=FIRST_DRINK_DATE)
+        for i in range(NUMBER_OF_DRINKS)
+    ])
+    ingredients = list(Ingredient.objects.order_by("pk"))
+    drinks = list(Drink.objects.order_by("pk"))
+    Recipe.objects.bulk_create([
+        Recipe(
+            Drink=drink,
+            Ingredient=ingredients[(i + j * 7) % len(ingredients)],
+            Quantity=1 + j,
+            Measurement="oz"
+        )
+        for i, drink in enumerate(drinks)
+        for j in range(RECIPE_SIZE)
+    ])
+    recomputeAlcohol()
+    drinks = list(Drink.objects.order_by("pk"))
+    SimilarDrink.objects.bulk_create([
+        SimilarDrink(Drink=drink, Similar=drinks[(i + j) % len(drinks)], Score=1 / j)
+        for i, drink in enumerate(drinks)
+        for j in range(1, 6)
+    ])
+    DrinkOfTheDay.objects.create(Date=date.today(), Drink=drinks[0])
+    return drinks, ingredients
+
+
+# View counts are only saved when a test flushes them
+@override_settings(VIEW_COUNTS_FLUSH_INTERVAL=3600)
+class DrinkQueryBudgetTestCase(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.drinks, cls.ingredients = seedCatalog()
+        cls.drink = cls.drinks[0]
+        cls.ingredient = cls.ingredients[0]
+        cls.recipe_item = Recipe.objects.filter(Drink=cls.drink).first()
+        cls.superuser = User.objects.create_superuser("admin", "admin@example.com", "password")
+
+    def setUp(self):
+        cache.clear()
+        invalidateIndexes()
+        viewCounter.reset()
+        self.client.force_login(self.superuser)
+
+    def test_home(self):
+        self.assertQueryBudget(4, reverse("drinks-home"))
+
+    def test_about(self):
+        self.assertQueryBudget(2, reverse("drinks-about"))
+
+    def test_drink_list(self):
+        response = self.assertQueryBudget(5, reverse("drinks-list"))
+        self.assertQueryBudget(3, reverse("drinks-list"), {"cursor": response.context["page_obj"].next_cursor})
+        self.assertQueryBudget(5, reverse("drinks-list"), {"Name": "Drink", "page": 2})
+
+    def test_tampered_cursor(self):
+        first_page = [drink.pk for drink in self.drinks[:30]]
+        for data in [
+            '[5,"next"]', '[["x","abc"],"next"]', '[["x",true],"next"]', '[null,"up"]', '"x"', "{",
+            f'[["x",{2 ** 70}],"next"]', f'[["x",{-2 ** 70}],"previous"]',
+        ]:
+            cursor = base64.urlsafe_b64encode(data.encode()).decode()
+            response = self.client.get(reverse("drinks-list"), {"cursor": cursor})
+            self.assertEqual([drink.pk for drink in response.context["page_obj"]], first_page)
+            response = self.client.get(reverse("api-drinks-list"), {"cursor": cursor})
+            self.assertEqual([drink["id"] for drink in response.json()["results"]], first_page)
+
+        # The ingredient's drinks are ordered by their integer pk
+        url = reverse("ingredient-detail", args=[self.ingredient.pk])
+        first_page = [item.pk for item in self.client.get(url).context["page_obj"]]
+        for data in ['[["abc",1],"next"]', f'[[{2 ** 70},1],"next"]', '[[1e400,1],"previous"]']:
+            cursor = base64.urlsafe_b64encode(data.encode()).decode()
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual([item.pk for item in response.context["page_obj"]], first_page)
+
+    def test_drink_list_cached(self):
+        self.assertQueryBudget(5, reverse("drinks-list"), {"Alcohol": "true"})
+        self.assertQueryBudget(2, reverse("drinks-list"), {"Alcohol": "true"})
+
+    # The seeded drinks of each type are: Cocktail 22 with alcohol and 16 without,
+    # Shot 15 and 23, Beer 23 and 14, Punch/Party Drink 15 and 22
+    def test_drink_list_facets(self):
+        def getCounts(facets):
+            return {facet["label"]: facet["count"] for facet in facets if facet["count"]}
+
+        response = self.assertQueryBudget(5, reverse("drinks-list"), {"Type": "Shot"})
+        facets = response.context["facets"]
+        self.assertEqual(getCounts(facets["types"]), {
+            "Cocktail": 38, "Shot": 38, "Beer": 37, "Punch/Party Drink": 37,
+        })
+        self.assertEqual([facet["label"] for facet in facets["types"] if facet["active"]], ["Shot"])
+        self.assertEqual(getCounts(facets["alcohol"]), {"Alcohol": 15, "Non-Alcohol": 23})
+
+        # The counts are cached for the drinks matching the same Name
+        response = self.assertQueryBudget(3, reverse("drinks-list"), {"Type": "Shot", "Alcohol": "true"})
+        self.assertEqual(len(response.context["page_obj"]), 15)
+        facets = response.context["facets"]
+        self.assertEqual(getCounts(facets["types"]), {
+            "Cocktail": 22, "Shot": 15, "Beer": 23, "Punch/Party Drink": 15,
+        })
+        self.assertEqual(getCounts(facets["alcohol"]), {"Alcohol": 15, "Non-Alcohol": 23})
+
+    def test_drink_detail(self):
+        url = reverse("drink-detail", args=[self.drink.pk])
+        self.assertQueryBudget(6, url)
+        self.assertQueryBudget(2, url)
+
+    def test_favorites(self):
+        url = reverse("drink-favorite", args=[self.drinks[1].pk])
+        response = self.client.post(url, {"next": reverse("drinks-list")})
+        self.assertRedirects(response, reverse("drinks-list"), fetch_redirect_response=False)
+        self.client.post(reverse("drink-favorite", args=[self.drinks[2].pk]))
+
+        response = self.assertQueryBudget(5, reverse("drinks-list"))
+        self.assertEqual(response.context["favorite_ids"], {self.drinks[1].pk, self.drinks[2].pk})
+        response = self.assertQueryBudget(3, reverse("drinks-favorites"))
+        self.assertEqual(list(response.context["page_obj"]), [self.drinks[1], self.drinks[2]])
+
+        response = self.client.post(url, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.json(), {"favorite": False})
+        response = self.assertQueryBudget(4, reverse("drinks-favorites"))
+        self.assertEqual(list(response.context["page_obj"]), [self.drinks[2]])
+
+    def test_popular_drinks(self):
+        for drink, views in [(self.drinks[1], 3), (self.drinks[2], 1), (self.drinks[1], 2)]:
+            for view in range(views):
+                self.client.get(reverse("drink-detail", args=[drink.pk]))
+        self.assertFalse(DrinkViews.objects.exists())
+
+        viewCounter.flush()
+        response = self.assertQueryBudget(2, reverse("drinks-popular"))
+        self.assertEqual(response.context["popular_drinks"], [(self.drinks[1], 5), (self.drinks[2], 1)])
+
+        cache.clear()
+        self.assertQueryBudget(3, reverse("drinks-popular"))
+
+    # Drink i uses the ingredients (i + 7 * j) % 60 for j from 0 to 4
+    def test_makeable_drinks(self):
+        url = reverse("drinks-makeable")
+        response = self.assertQueryBudget(6, url, {
+            "Ingredients": [ingredient.pk for ingredient in self.ingredients[:20]],
+            "Missing": 2,
+        })
+        self.assertEqual(response.context["paginator"].count, 42)
+        self.assertEqual(response.context["matches"][:8], [
+            (self.drinks[i], 2) for i in [0, 1, 2, 3, 4, 5, 46, 47]
+        ])
+
+        ingredient_ids = [ingredient.pk for ingredient in self.ingredients[:30]]
+        response = self.client.get(url, {"Ingredients": ingredient_ids, "Missing": 0})
+        self.assertEqual(response.context["matches"], [
+            (self.drinks[i], 0) for i in [0, 1, 60, 61, 120, 121]
+        ])
+        response = self.client.get(url, {"Ingredients": ingredient_ids, "Missing": 1})
+        self.assertEqual(response.context["paginator"].count, 41)
+        self.assertEqual(response.context["matches"][4:9], [
+            (self.drinks[120], 0), (self.drinks[121], 0), (self.drinks[2], 1), (self.drinks[3], 1), (self.drinks[4], 1)
+        ])
+
+    def test_catalog_export(self):
+        self.assertQueryBudget(4, reverse("drinks-export"), {"format": "csv"})
+
+    def test_drink_forms(self):
+        self.assertQueryBudget(2, reverse("drink-create"))
+        self.assertQueryBudget(3, reverse("drink-update", args=[self.drink.pk]))
+        self.assertQueryBudget(3, reverse("drink-delete", args=[self.drink.pk]))
+
+    def test_ingredient_list(self):
+        self.assertQueryBudget(3, reverse("ingredients-list"))
+        self.assertQueryBudget(4, reverse("ingredients-list"), {"Name": "Ingredient"})
+
+    def test_drink_typeahead(self):
+        url = reverse("drinks-typeahead")
+        self.assertQueryBudget(3, url, {"q": "drink"})
+        response = self.assertQueryBudget(2, url, {"q": "Drink 14"})
+        self.assertEqual(response["Cache-Control"], "private, max-age=60")
+        self.assertEqual([result["text"] for result in response.json()["results"]], [
+            "Drink 140", "Drink 141", "Drink 142", "Drink 143",
+            "Drink 144", "Drink 145", "Drink 146", "Drink 147",
+        ])
+
+        self.client.logout()
+        self.assertEqual(self.client.get(url, {"q": "drink"}).status_code, 403)
+
+    def test_ingredient_autocomplete(self):
+        url = reverse("ingredients-autocomplete")
+        response = self.assertQueryBudget(3, url, {"q": "ingredient 01"})
+        self.assertEqual(len(response.json()["results"]), 10)
+        response = self.assertQueryBudget(2, url, {"q": "Ingredient 059"})
+        self.assertEqual(response.json()["results"], [{"id": self.ingredients[59].pk, "text": "Ingredient 059"}])
+
+    def test_ingredient_views(self):
+        self.assertQueryBudget(4, reverse("ingredient-detail", args=[self.ingredient.pk]))
+        self.assertQueryBudget(2, reverse("ingredient-create"))
+        self.assertQueryBudget(3, reverse("ingredient-update", args=[self.ingredient.pk]))
+        self.assertQueryBudget(3, reverse("ingredient-delete", args=[self.ingredient.pk]))
+
+    def test_ingredient_usage(self):
+        recountIngredientUsage()
+        url = reverse("ingredient-detail", args=[self.ingredient.pk])
+        items = list(Recipe.objects.filter(Ingredient=self.ingredient).order_by("Drink_id"))
+        response = self.assertQueryBudget(4, url)
+        self.assertEqual(response.context["ingredient"].UsageCount, len(items))
+        self.assertEqual(list(response.context["page_obj"]), items)
+
+    def test_recipe_forms(self):
+        drink_id = self.drink.pk
+        self.assertQueryBudget(3, reverse("recipe-create", kwargs={"drink_id": drink_id}))
+        self.assertQueryBudget(
+            4, reverse("recipe-update", kwargs={"drink_id": drink_id, "pk": self.recipe_item.pk})
+        )
+        self.assertQueryBudget(
+            3, reverse("recipe-delete", kwargs={"drink_id": drink_id, "pk": self.recipe_item.pk})
+        )
+
+    # The data of a recipe editor form submitted with its lines unchanged
+    def getRecipeData(self, formset):
+        data = {
+            f"{formset.prefix}-{key}": value for key, value in formset.management_form.initial.items()
+        }
+        for form in formset.initial_forms:
+            data[f"{form.prefix}-id"] = form.instance.pk
+            data[f"{form.prefix}-Ingredient"] = form.instance.Ingredient_id
+            data[f"{form.prefix}-Quantity"] = form.instance.Quantity
+            data[f"{form.prefix}-Measurement"] = form.instance.Measurement
+        return data
+
+    def test_recipe_editor(self):
+        url = reverse("recipe-edit", kwargs={"drink_id": self.drink.pk})
+        response = self.assertQueryBudget(4, url)
+        formset = response.context["formset"]
+
+        # Every line but the first is deleted, the first one changes its ingredient
+        # and a new one is added, both without alcohol
+        data = self.getRecipeData(formset)
+        for form in formset.initial_forms[1:]:
+            data[f"{form.prefix}-DELETE"] = "on"
+        first, new = formset.initial_forms[0], formset.extra_forms[0]
+        data[f"{first.prefix}-Ingredient"] = self.ingredients[1].pk
+        data.update({
+            f"{new.prefix}-Ingredient": self.ingredients[2].pk,
+            f"{new.prefix}-Quantity": "2.50",
+            f"{new.prefix}-Measurement": "cl",
+        })
+
+        # An ingredient can only be used once
+        response = self.client.post(url, dict(data, **{f"{new.prefix}-Ingredient": self.ingredients[1].pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["formset"].non_form_errors())
+
+        # A line saved meanwhile by another view is reported, not a server error
+        with mock.patch("drinks.views.saveRecipeFormset", side_effect=IntegrityError):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["formset"].non_form_errors())
+
+        # The number of queries doesn't depend on the number of lines
+        with self.assertNumQueries(15):
+            response = self.client.post(url, data)
+        self.assertRedirects(response, reverse("drink-detail", args=[self.drink.pk]), fetch_redirect_response=False)
+        self.assertEqual(
+            set(Recipe.objects.filter(Drink=self.drink).values_list("Ingredient_id", "Measurement")),
+            {(self.ingredients[1].pk, first.instance.Measurement), (self.ingredients[2].pk, "cl")}
+        )
+        self.assertFalse(Drink.objects.get(pk=self.drink.pk).Alcohol)
+        for ingredient in Ingredient.objects.filter(pk__in=[item.Ingredient_id for item in formset.queryset]):
+            self.assertEqual(ingredient.UsageCount, Recipe.objects.filter(Ingredient=ingredient).count())
+
+        # Two lines can swap their ingredients
+        formset = self.client.get(url).context["formset"]
+        first, second = formset.initial_forms
+        data = self.getRecipeData(formset)
+        data[f"{first.prefix}-Ingredient"] = second.instance.Ingredient_id
+        data[f"{second.prefix}-Ingredient"] = first.instance.Ingredient_id
+        response = self.client.post(url, data)
+        self.assertRedirects(response, reverse("drink-detail", args=[self.drink.pk]), fetch_redirect_response=False)
+        self.assertEqual(
+            set(Recipe.objects.filter(Drink=self.drink).values_list("Ingredient_id", "Quantity")),
+            {
+                (second.instance.Ingredient_id, first.instance.Quantity),
+                (first.instance.Ingredient_id, second.instance.Quantity),
+            }
+        )
+
+    def test_api(self):
+        response = self.assertQueryBudget(3, reverse("api-drinks-list"))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("api-drinks-list"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        url = reverse("api-drink-detail", args=[self.drink.pk])
+        response = self.assertQueryBudget(5, url)
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        self.assertQueryBudget(4, reverse("api-ingredient-detail", args=[self.ingredient.pk]))
+
+
+class SimilarDrinksTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.drinks, cls.ingredients = seedCatalog()
+
+    def setUp(self):
+        recipeIndex.invalidate()
+
+    def getStaleDrinks(self):
+        return set(Drink.objects.filter(SimilarStale=True).values_list("pk", flat=True))
+
+    # Every seeded drink lists the five drinks after it
+    def test_few_changes_are_scored_right_away(self):
+        drink = self.drinks[10]
+        recipesChanged([drink.pk])
+        self.assertEqual(self.getStaleDrinks(), {other.pk for other in self.drinks[5:10]})
+        self.assertEqual(
+            list(SimilarDrink.objects.filter(Drink=drink).values_list("Similar_id", "Score")),
+            recipeIndex.similar(drink.pk, SIMILAR_DRINKS)
+        )
+
+    def test_bulk_changes_are_left_to_the_command(self):
+        recipesChanged([drink.pk for drink in self.drinks[10:20]])
+        self.assertEqual(self.getStaleDrinks(), {drink.pk for drink in self.drinks[5:20]})
+        self.assertEqual(
+            list(SimilarDrink.objects.filter(Drink=self.drinks[10]).values_list("Similar_id", flat=True)),
+            [drink.pk for drink in self.drinks[11:16]]
+        )
+
+        call_command("compute_similar_drinks", stale=True, stdout=StringIO())
+        self.assertEqual(self.getStaleDrinks(), set())
+        self.assertEqual(
+            list(SimilarDrink.objects.filter(Drink=self.drinks[10]).values_list("Similar_id", "Score")),
+            recipeIndex.similar(self.drinks[10].pk, SIMILAR_DRINKS)
+        )
+
+
+class RecipeIndexTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.drinks, cls.ingredients = seedCatalog()
+
+    def setUp(self):
+        cache.clear()
+        recipeIndex.invalidate()
+
+    # The other index stands for the copy of another worker process
+    def test_changes_reach_other_processes(self):
+        drink = self.drinks[0]
+        ingredient_ids = [self.ingredients[59].pk]
+        other = RecipeIndex()
+        self.assertNotIn((drink.pk, 5), recipeIndex.makeable(ingredient_ids, 5))
+        self.assertNotIn((drink.pk, 5), other.makeable(ingredient_ids, 5))
+
+        Recipe.objects.create(Drink=drink, Ingredient=self.ingredients[59], Quantity=1, Measurement="oz")
+        with mock.patch.object(recipeIndex, "build") as build:
+            recipesChanged([drink.pk])
+            self.assertIn((drink.pk, 5), recipeIndex.makeable(ingredient_ids, 5))
+        build.assert_not_called()
+        self.assertNotIn((drink.pk, 5), other.makeable(ingredient_ids, 5))
+
+        other.checked -= INDEX_SYNC_INTERVAL
+        self.assertIn((drink.pk, 5), other.makeable(ingredient_ids, 5))
+
+
+class CatalogExportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        gin = Ingredient.objects.create(Name="Gin", Alcohol=True)
+        tonic = Ingredient.objects.create(Name="Tonic")
+        lemon = Ingredient.objects.create(Name="Lemon Juice")
+        gin_tonic = Drink.objects.create(Name="Gin Tonic", Type="Cocktail", Alcohol=True, Datestamp=date(2020, 5, 1))
+        lemonade = Drink.objects.create(Name="Lemonade", Type="Soft Drink/Soda", Datestamp=date(2020, 6, 1))
+        Drink.objects.create(Name="Water", Type="Other/Unknown", Datestamp=date(2020, 7, 1))
+        Recipe.objects.create(Drink=gin_tonic, Ingredient=tonic, Quantity=4, Measurement="oz")
+        Recipe.objects.create(Drink=gin_tonic, Ingredient=gin, Quantity="1.5", Measurement="oz")
+        Recipe.objects.create(Drink=lemonade, Ingredient=lemon, Quantity=2, Measurement="cl")
+        cls.superuser = User.objects.create_superuser("admin", "admin@example.com", "password")
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def export(self, format):
+        response = self.client.get(reverse("drinks-export"), {"format": format})
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def getCatalog(self):
+        return (
+            set(Drink.objects.values_list("Name", "Type", "Alcohol", "Datestamp")),
+            set(Ingredient.objects.values_list("Name", "Alcohol")),
+            set(Recipe.objects.values_list("Drink__Name", "Ingredient__Name", "Quantity", "Measurement")),
+        )
+
+    # Recipe items are sorted by ingredient name
+    def test_jsonl(self):
+        self.assertEqual([json.loads(line) for line in self.export("jsonl")], [
+            {"Name": "Gin Tonic", "Type": "Cocktail", "Alcohol": True, "Datestamp": "2020-05-01", "Recipe": [
+                {"Ingredient": "Gin", "Alcohol": True, "Quantity": "1.50", "Measurement": "oz"},
+                {"Ingredient": "Tonic", "Alcohol": False, "Quantity": "4.00", "Measurement": "oz"},
+            ]},
+            {"Name": "Lemonade", "Type": "Soft Drink/Soda", "Alcohol": False, "Datestamp": "2020-06-01", "Recipe": [
+                {"Ingredient": "Lemon Juice", "Alcohol": False, "Quantity": "2.00", "Measurement": "cl"},
+            ]},
+            {"Name": "Water", "Type": "Other/Unknown", "Alcohol": False, "Datestamp": "2020-07-01", "Recipe": []},
+        ])
+
+    def test_csv(self):
+        self.assertEqual(self.export("csv"), [
+            "Drink,Type,Datestamp,Ingredient,Alcohol,Quantity,Measurement",
+            "Gin Tonic,Cocktail,2020-05-01,Gin,True,1.50,oz",
+            "Gin Tonic,Cocktail,2020-05-01,Tonic,False,4.00,oz",
+            "Lemonade,Soft Drink/Soda,2020-06-01,Lemon Juice,False,2.00,cl",
+            "Water,Other/Unknown,2020-07-01,,,,",
+        ])
+
+    # Exporting, emptying the catalog and importing the file gives the same catalog
+    def test_round_trip(self):
+        catalog = self.getCatalog()
+        for format in FORMATS:
+            with self.subTest(format=format), tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, f"catalog.{format}")
+                call_command("export_catalog", path)
+                Drink.objects.all().delete()
+                Ingredient.objects.all().delete()
+
+                call_command("import_catalog", path, stdout=StringIO())
+                self.assertEqual(self.getCatalog(), catalog)
+
+
+class CatalogImportTestCase(TestCase):
+    def test_invalid_records_are_skipped(self):
+        lines = StringIO("\n".join([
+            '{"Name": "Gin Tonic", "Type": "Cocktail", "Recipe": ['
+            '{"Ingredient": "Gin", "Alcohol": true, "Quantity": "2", "Measurement": "oz"}, '
+            '{"Ingredient": "Tonic", "Quantity": "4", "Measurement": "oz"}]}',
+            '{"Name": "Broken", "Recipe": [',
+            '["Not", "a", "drink"]',
+            '{"Type": "Cocktail", "Recipe": []}',
+            '{"Name": "Screwdriver", "Type": "Cocktail", "Recipe": [{"Ingredient": "Vodka"}]}',
+            '{"Name": "Gimlet", "Type": "Cocktail", "Recipe": ['
+            '{"Ingredient": "Gin", "Quantity": "2", "Measurement": "oz"}]}',
+        ]))
+        output = StringIO()
+        with mock.patch("sys.stdin", lines):
+            call_command("import_catalog", "-", stdout=output)
+
+        self.assertEqual(set(Drink.objects.values_list("Name", "Alcohol")), {("Gin Tonic", True), ("Gimlet", True)})
+        self.assertEqual(Ingredient.objects.get(Name="Gin").UsageCount, 2)
+        skipped = [line for line in output.getvalue().splitlines() if line.startswith("Skipped: ")]
+        self.assertIn("skipped 4 drinks", output.getvalue())
+        self.assertEqual(len(skipped), 4)
+        self.assertTrue(skipped[0].startswith("Skipped: Line 2 isn't valid JSON"))
+        self.assertEqual(skipped[1:], [
+            "Skipped: Line 3 isn't a JSON object",
+            "Skipped: A drink has no name: {'Type': 'Cocktail', 'Recipe': []}",
+            "Skipped: A recipe item of drink 'Screwdriver' has no 'Quantity'",
+        ])
+
+    def test_csv_missing_columns(self):
+        lines = StringIO("Drink,Type,Ingredient\nGin Tonic,Cocktail,Gin\n")
+        with mock.patch("sys.stdin", lines):
+            with self.assertRaisesMessage(CommandError, "The CSV file has no Quantity, Measurement column."):
+                call_command("import_catalog", "-", format="csv", stdout=StringIO())
+        self.assertFalse(Drink.objects.exists())
+
+
+class DrinkOfTheDayTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.old_drink = Drink.objects.create(Name="Old Fashioned", Type="Cocktail", Datestamp=FIRST_DRINK_DATE)
+        cls.new_drink = Drink.objects.create(Name="New Drink", Type="Cocktail", Datestamp=date(2021, 1, 1))
+
+    def test_scheduled_day(self):
+        day = date(2021, 6, 1)
+        DrinkOfTheDay.objects.create(Date=day, Drink=self.new_drink)
+        with self.assertNumQueries(1):
+            self.assertEqual(getDrinkOfTheDay(day), self.new_drink)
+
+    # Only the drinks made before the day can be picked
+    def test_unscheduled_day_is_filled_in(self):
+        day = date(2020, 6, 1)
+        self.assertEqual(getDrinkOfTheDay(day), self.old_drink)
+        self.assertEqual(DrinkOfTheDay.objects.get(Date=day).Drink, self.old_drink)
+        with self.assertNumQueries(1):
+            self.assertEqual(getDrinkOfTheDay(day), self.old_drink)
+
+    def test_no_drinks_available(self):
+        self.assertIsNone(getDrinkOfTheDay(FIRST_DRINK_DATE))
+        self.assertFalse(DrinkOfTheDay.objects.exists())
+
+    def test_refresh(self):
+        day = date(2020, 6, 1)
+        DrinkOfTheDay.objects.create(Date=day, Drink=self.new_drink)
+        self.assertEqual(scheduleDrinkOfTheDay(day).Drink, self.new_drink)
+        self.assertEqual(scheduleDrinkOfTheDay(day, refresh=True).Drink, self.old_drink)
+        self.assertEqual(DrinkOfTheDay.objects.get(Date=day).Drink, self.old_drink)
+
+
+class RecomputeAlcoholTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.gin = Ingredient.objects.create(Name="Gin", Alcohol=True)
+        cls.tonic = Ingredient.objects.create(Name="Tonic", Alcohol=False)
+        cls.gin_tonic = Drink.objects.create(Name="Gin Tonic", Type="Cocktail")
+        cls.tonic_water = Drink.objects.create(Name="Tonic Water", Type="Cocktail", Alcohol=True)
+        for drink, ingredients in [(cls.gin_tonic, [cls.gin, cls.tonic]), (cls.tonic_water, [cls.tonic])]:
+            for ingredient in ingredients:
+                Recipe.objects.create(Drink=drink, Ingredient=ingredient, Quantity=1, Measurement="oz")
+
+    def getAlcohol(self):
+        return dict(Drink.objects.values_list("Name", "Alcohol"))
+
+    def getModified(self):
+        return dict(Drink.objects.values_list("Name", "Modified"))
+
+    # Only the drinks whose flag is wrong are written
+    def test_recompute(self):
+        modified = self.getModified()
+        self.assertEqual(recomputeAlcohol(), 2)
+        self.assertEqual(self.getAlcohol(), {"Gin Tonic": True, "Tonic Water": False})
+        self.assertNotEqual(self.getModified(), modified)
+
+        modified = self.getModified()
+        with mock.patch("drinks.services.catalogChanged") as catalogChanged:
+            self.assertEqual(recomputeAlcohol(), 0)
+        catalogChanged.assert_not_called()
+        self.assertEqual(self.getModified(), modified)
+
+    def test_only_given_drinks(self):
+        recomputeAlcohol(Drink.objects.filter(pk=self.gin_tonic.pk))
+        self.assertEqual(self.getAlcohol(), {"Gin Tonic": True, "Tonic Water": True})
+
+    def test_excluded_ingredient(self):
+        recomputeAlcohol(excluded_ingredient=self.gin)
+        self.assertEqual(self.getAlcohol(), {"Gin Tonic": False, "Tonic Water": False})
+
+
+class SearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ["Margarita", "Frozen Margarita", "Mojito", "Martini"]:
+            Drink.objects.create(Name=name, Type="Cocktail")
+
+    def search(self, value):
+        return list(searchByName(Drink.objects.order_by("Name"), "Name", value).values_list("Name", flat=True))
+
+    def test_contains(self):
+        self.assertEqual(self.search("MARGARITA"), ["Frozen Margarita", "Margarita"])
+        self.assertEqual(self.search(""), ["Frozen Margarita", "Margarita", "Martini", "Mojito"])
+
+    # The closest names come first and typos still match
+    @skipUnless(connection.vendor == "postgresql", "Trigram search needs PostgreSQL")
+    def test_ranking(self):
+        self.assertEqual(self.search("margarita"), ["Margarita", "Frozen Margarita"])
+        self.assertEqual(self.search("margaritta")[0], "Margarita")
+        self.assertNotIn("Martini", self.search("margaritta"))
+
+
+class ViewCounterTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.drink = Drink.objects.create(Name="Gin Tonic", Type="Cocktail")
+
+    def getViews(self):
+        return dict(DrinkViews.objects.values_list("Drink_id", "Views"))
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=3600)
+    def test_views_are_kept_until_due(self):
+        counter = ViewCounter()
+        counter.increment(self.drink.pk)
+        counter.increment(self.drink.pk)
+        self.assertEqual(self.getViews(), {})
+
+        with override_settings(VIEW_COUNTS_FLUSH_INTERVAL=0):
+            counter.increment(self.drink.pk)
+        self.assertEqual(self.getViews(), {self.drink.pk: 3})
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=3600)
+    def test_views_are_flushed_at_exit(self):
+        with mock.patch("atexit.register") as register:
+            counter = ViewCounter()
+        register.assert_called_once_with(counter.flush)
+
+        counter.increment(self.drink.pk)
+        register.call_args[0][0]()
+        self.assertEqual(self.getViews(), {self.drink.pk: 1})
+
+
+# The catalog version is only bumped once the change is committed, which needs
+# real transactions
+class CatalogCacheTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        invalidateIndexes()
+        self.gin = Ingredient.objects.create(Name="Gin", Alcohol=True)
+        self.tonic = Ingredient.objects.create(Name="Tonic")
+        self.drink = Drink.objects.create(Name="Gin Tonic", Type="Cocktail")
+        Recipe.objects.create(Drink=self.drink, Ingredient=self.gin, Quantity=2, Measurement="oz")
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+
+    def getPages(self):
+        return (
+            self.client.get(reverse("drinks-list")).content.decode(),
+            self.client.get(reverse("drink-detail", args=[self.drink.pk])).content.decode(),
+        )
+
+    # Reads the pages once to fill the cache and once more from it, with only the
+    # session and user queries of both requests
+    def getCachedPages(self):
+        self.getPages()
+        with self.assertNumQueries(4):
+            return self.getPages()
+
+    def test_drink_change(self):
+        list_page, detail_page = self.getCachedPages()
+        self.assertNotIn("Gin And Tonic", list_page)
+        self.drink.Name = "Gin And Tonic"
+        self.drink.save()
+        list_page, detail_page = self.getCachedPages()
+        self.assertIn("Gin And Tonic", list_page)
+        self.assertIn("Gin And Tonic", detail_page)
+
+    def test_recipe_change(self):
+        list_page, detail_page = self.getCachedPages()
+        self.assertNotRegex(detail_page, r"4.00\s+oz\s+Tonic")
+        Recipe.objects.create(Drink=self.drink, Ingredient=self.tonic, Quantity=4, Measurement="oz")
+        list_page, detail_page = self.getCachedPages()
+        self.assertRegex(detail_page, r"4.00\s+oz\s+Tonic")
+
+    def test_ingredient_change(self):
+        list_page, detail_page = self.getCachedPages()
+        self.assertNotIn("Dry Gin", detail_page)
+        self.gin.Name = "Dry Gin"
+        self.gin.save()
+        list_page, detail_page = self.getCachedPages()
+        self.assertIn("Dry Gin", detail_page)
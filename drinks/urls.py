@@ -3,33 +3,50 @@ from .views import (
     home,
     about,
     DrinkListView, 
+    MakeableDrinkListView,
+    PopularDrinkListView,
+    FavoriteDrinkListView,
+    DrinkFavoriteView,
+    DrinkTypeaheadView,
+    CatalogExportView,
     DrinkDetailView, 
     DrinkCreateView, 
     DrinkUpdateView,
     DrinkDeleteView,
     IngredientListView,
     IngredientDetailView,
+    IngredientAutocompleteView,
     IngredientCreateView,
     IngredientUpdateView,
     IngredientDeleteView,
+    RecipeEditView,
     RecipeCreateView,
     RecipeUpdateView,
     RecipeDeleteView
 )
+from .api import DrinkListApiView, DrinkDetailApiView, IngredientDetailApiView
 
 urlpatterns = [
     path('', home, name="drinks-home"),
     path('about/', about, name="drinks-about"),
     path('drinks/', DrinkListView.as_view(), name="drinks-list"),
+    path('drinks/favorites/', FavoriteDrinkListView.as_view(), name="drinks-favorites"),
+    path('drinks/popular/', PopularDrinkListView.as_view(), name="drinks-popular"),
+    path('drinks/makeable/', MakeableDrinkListView.as_view(), name="drinks-makeable"),
+    path('drinks/typeahead/', DrinkTypeaheadView.as_view(), name="drinks-typeahead"),
+    path('drinks/export/', CatalogExportView.as_view(), name="drinks-export"),
     path('drinks/new/', DrinkCreateView.as_view(), name="drink-create"),
     path('drinks/<int:pk>/', DrinkDetailView.as_view(), name="drink-detail"),
+    path('drinks/<int:pk>/favorite/', DrinkFavoriteView.as_view(), name="drink-favorite"),
     path('drinks/<int:pk>/update/', DrinkUpdateView.as_view(), name="drink-update"),
     path('drinks/<int:pk>/delete/', DrinkDeleteView.as_view(), name="drink-delete"),
     path('ingredients/', IngredientListView.as_view(), name="ingredients-list"),
+    path('ingredients/autocomplete/', IngredientAutocompleteView.as_view(), name="ingredients-autocomplete"),
     path('ingredients/new/', IngredientCreateView.as_view(), name="ingredient-create"),
     path('ingredients/<int:pk>/', IngredientDetailView.as_view(), name="ingredient-detail"),
     path('ingredients/<int:pk>/update', IngredientUpdateView.as_view(), name="ingredient-update"),
     path('ingredients/<int:pk>/delete', IngredientDeleteView.as_view(), name="ingredient-delete"),
+    path('drinks/<int:drink_id>/recipes/', RecipeEditView.as_view(), name="recipe-edit"),
     path('drinks/<int:drink_id>/recipes/new/', RecipeCreateView.as_view(), name="recipe-create"),
     path(
         'drinks/<int:drink_id>/recipes/<int:pk>/update/',
@@ -41,4 +58,7 @@ urlpatterns = [
         RecipeDeleteView.as_view(),
         name="recipe-delete"
     ),
+    path('api/drinks/', DrinkListApiView.as_view(), name="api-drinks-list"),
+    path('api/drinks/<int:pk>/', DrinkDetailApiView.as_view(), name="api-drink-detail"),
+    path('api/ingredients/<int:pk>/', IngredientDetailApiView.as_view(), name="api-ingredient-detail"),
 ]
\ No newline at end of file
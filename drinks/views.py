@@ -1,60 +1,64 @@
 from django.contrib import messages
-from django.shortcuts import render, redirect
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
 from django.views.generic import (
+    View,
     ListView,
+    TemplateView,
     DetailView,
     CreateView,
     UpdateView,
     DeleteView
 )
-from .models import Drink, Ingredient, Recipe
+from .models import DRINK_TYPES, Drink, Ingredient, Recipe
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from datetime import date, timedelta
+from .cache import (
+    CatalogPageCacheMixin,
+    getCachedData,
+    getCacheTimeout,
+    getCatalogCacheKey,
+    normalizeQuery
+)
+from .catalog import FORMATS, iterCatalog, writeCatalog
+from .counters import getPopularDrinks, viewCounter
 from .filters import DrinkFilter, IngredientFilter
-from django.core.paginator import Paginator
-
-# Returns a drink using modular exponentation on today's date.
-# Then the number is divided again so that it can access an item in the keys list.
-# The value obtained from the list is used to retrieve the drink.
-def getDrinkOfTheDay(drink_keys):
-    # Perform modular exponentation on today's date, then reduce it to number_of_drinks
-    index = pow(
-        int(date.today().strftime("%Y%m%d")), 
-        3540034045828155908745054744418277834243309928115463377391493476491109069681,
-        72437346919515671440505456097276374932311092479844125795754094155925023764307
-    ) % drink_keys.count()
-
-    # Return the drink with the key at the calculated index
-    return Drink.objects.get(pk=drink_keys[index])
-
+from .forms import MakeableDrinkForm, RecipeForm, RecipeFormSet
+from .indexes import drinkNames, ingredientNames, recipeIndex
+from .pagination import KeysetPaginationMixin, paginateByCursor
+from .services import (
+    countDrinksByFacet,
+    getDrinkOfTheDay,
+    getFavoriteDrinkIds,
+    getDrinksUsingIngredient,
+    recomputeAlcohol,
+    saveRecipeFormset,
+    toggleFavorite
+)
+from .signals import queueCatalogChange
 
-# The home page generates a drink's data as long from a list of drinks made
-# prior to today. If none are available, then no drink data is displayed.
+# The home page displays the drink of the day, which is scheduled from the drinks
+# made prior to today. If none are available, then no drink data is displayed.
 def home(request):
-    # Get the range of dates from October 1, 2020 to the day before today.
-    # No drinks were saved prior to October 1, 2020
-    start_date = date(2020, 1, 1).strftime("%Y-%m-%d")
-    end_date = (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
-
-    # Using the date range, filter out the drinks made today and save the total
-    drink_keys = Drink.objects.filter(
-        Datestamp__range=[start_date, end_date]
-    ).order_by("pk").values_list("pk", flat=True)
-
-    # If the number of drinks made before today is over 1, then pick a drink
-    if drink_keys:
+    drink = getDrinkOfTheDay()
+
+    # If a drink has been scheduled for today, then there are drinks to display
+    if drink:
         # Users that are logged in will get a "drink of the day" displayed.
         # Those that aren't logged in will receive the first drink in the list
-        if request.user.is_authenticated:
-            drink = getDrinkOfTheDay(drink_keys)
-        else:
+        if not request.user.is_authenticated:
             drink = Drink.objects.first()
 
         # Save the page title as well as the drink and recipe data
         context = { 
           "title": "Home" , 
           "drink": drink,
-          "recipe": Recipe.objects.filter(Drink=drink).order_by("Ingredient")
+          "recipe": Recipe.objects.filter(Drink=drink).select_related("Ingredient").order_by("Ingredient")
         }
     else:
         # Save only the title of the page
@@ -66,13 +70,15 @@ def about(request):
     return render(request, "drinks/about.html", { "title": "About" })
 
 
-class DrinkListView(LoginRequiredMixin, ListView):
+class DrinkListView(LoginRequiredMixin, CatalogPageCacheMixin, KeysetPaginationMixin, ListView):
     model = Drink
     template_name = "drinks/drinks.html"
     context_object_name = 'drinks'
     ordering = ['Name']
     paginate_by = 30
     filterset_class = DrinkFilter
+    cache_parameters = ["Name", "Type", "Alcohol", "page", "cursor"]
+    search_parameter = "Name"
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -83,22 +89,198 @@ class DrinkListView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['title'] = "List of Drinks"
         context['form'] = self.drinks.form
-        context['paginator'] = Paginator(self.drinks.qs, self.paginate_by)
-        context['page_obj'] = context['paginator'].get_page(self.request.GET.get("page"))
+
+        # The rendered form is cached in the template, keyed by the search
+        context['form_query'] = normalizeQuery(self.request.GET, ["Name", "Type", "Alcohol"])
+        context['cache_timeout'] = getCacheTimeout()
+        context['facets'] = self.get_facets()
+        context['favorite_ids'] = getFavoriteDrinkIds(self.request.user)
         return context
 
+    # Every facet shows how many drinks it would list given the other filters. All
+    # of them come from one count per Type and Alcohol of the drinks matching the
+    # Name, which is cached until the catalog changes.
+    def get_facets(self):
+        name = self.request.GET.get("Name", "")
+        key = getCatalogCacheKey("drinks-facets", name)
+        counts = getCachedData(key)
+        if counts is None:
+            counts = countDrinksByFacet(
+                self.filterset_class({ "Name": name }, queryset=Drink.objects.all()).qs
+            )
+            cache.set(key, counts, getCacheTimeout())
+
+        filters = getattr(self.drinks.form, "cleaned_data", {})
+        current_type = filters.get("Type") or None
+        current_alcohol = filters.get("Alcohol")
+
+        def makeFacet(parameter, value, label, count, active):
+            query = self.request.GET.copy()
+            for key in (parameter, self.page_kwarg, self.cursor_kwarg):
+                query.pop(key, None)
+            if not active:
+                query[parameter] = value
+            return { "label": label, "count": count, "active": active, "query": query.urlencode() }
+
+        types = [
+            makeFacet("Type", value, label, sum(
+                count for (type, alcohol), count in counts.items()
+                if type == value and current_alcohol in (None, alcohol)
+            ), current_type == value)
+            for value, label in DRINK_TYPES
+        ]
+        alcohol = [
+            makeFacet("Alcohol", value, label, sum(
+                count for (type, alcohol), count in counts.items()
+                if alcohol == flag and current_type in (None, type)
+            ), current_alcohol == flag)
+            for value, label, flag in [("true", "Alcohol", True), ("false", "Non-Alcohol", False)]
+        ]
+        return { "types": types, "alcohol": alcohol }
+
 
 class DrinkDetailView(LoginRequiredMixin, DetailView):
     model = Drink
     context_object_name = 'drink'
 
+    # The drink, its recipe and its similar drinks are cached together until the
+    # catalog changes. Drinks that don't exist aren't cached.
+    def get_object(self, queryset=None):
+        key = getCatalogCacheKey("drink-detail", self.kwargs["pk"])
+        self.cached = getCachedData(key)
+        if self.cached is None:
+            drink = super().get_object(queryset)
+            self.cached = {
+                "drink": drink,
+                "recipe": list(
+                    Recipe.objects.filter(Drink=drink).select_related("Ingredient").order_by("Ingredient")
+                ),
+                "similar_drinks": list(drink.similar_drinks.select_related("Similar")),
+            }
+            cache.set(key, self.cached, getCacheTimeout())
+        return self.cached["drink"]
+
+    # Views are counted in memory and saved in batches
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        viewCounter.increment(self.object.pk)
+        return response
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = self.object
-        context["recipe"] = Recipe.objects.filter(Drink=self.object).order_by("Ingredient")
+        context["recipe"] = self.cached["recipe"]
+        context["similar_drinks"] = self.cached["similar_drinks"]
+        context["favorite_ids"] = getFavoriteDrinkIds(self.request.user)
+        return context
+
+
+# The favorites of the user, in the same order and pages as the list of drinks
+class FavoriteDrinkListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    template_name = "drinks/favorites.html"
+    context_object_name = 'drinks'
+    paginate_by = 30
+
+    def get_queryset(self):
+        return Drink.objects.filter(favorited_by__User=self.request.user).order_by("Name")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = "My Favorites"
+        context['favorite_ids'] = getFavoriteDrinkIds(self.request.user)
+        return context
+
+
+# Stars or unstars a drink, then goes back to the page the form was sent from
+class DrinkFavoriteView(LoginRequiredMixin, View):
+    def post(self, request, *args, **kwargs):
+        drink = get_object_or_404(Drink.objects.only("pk"), pk=kwargs["pk"])
+        favorite = toggleFavorite(request.user, drink)
+        if request.headers.get("Accept") == "application/json":
+            return JsonResponse({ "favorite": favorite })
+
+        next_url = request.POST.get("next")
+        if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+            next_url = reverse("drink-detail", kwargs={"pk": drink.pk})
+        return redirect(next_url)
+
+
+class PopularDrinkListView(LoginRequiredMixin, TemplateView):
+    template_name = "drinks/popular.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = "Popular Drinks"
+        context['popular_drinks'] = getPopularDrinks()
+        return context
+
+
+class MakeableDrinkListView(LoginRequiredMixin, ListView):
+    template_name = "drinks/makeable.html"
+    context_object_name = 'matches'
+    paginate_by = 30
+
+    # The matches come from the in-process recipe index as (drink pk, missing) pairs
+    def get_queryset(self):
+        self.form = MakeableDrinkForm(self.request.GET or None)
+        if not self.form.is_valid():
+            return []
+        return recipeIndex.makeable(
+            [ingredient.pk for ingredient in self.form.cleaned_data["Ingredients"]],
+            self.form.cleaned_data["Missing"] or 0
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = "What Can I Make?"
+        context['form'] = self.form
+
+        # Only the drinks on the current page are loaded
+        page = context['page_obj'].object_list
+        drinks = Drink.objects.in_bulk([drink_id for drink_id, missing in page])
+        context['matches'] = [
+            (drinks[drink_id], missing) for drink_id, missing in page if drink_id in drinks
+        ]
         return context
 
 
+class CatalogExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    content_types = { "jsonl": "application/x-ndjson", "csv": "text/csv" }
+
+    # The catalog is streamed as it's read, so the response starts right away
+    def get(self, request, *args, **kwargs):
+        format = request.GET.get("format")
+        if format not in FORMATS:
+            format = "jsonl"
+        response = StreamingHttpResponse(
+            writeCatalog(iterCatalog(), format),
+            content_type=self.content_types[format]
+        )
+        response["Content-Disposition"] = f'attachment; filename="drinks.{format}"'
+        return response
+
+    def test_func(self):
+        return self.request.user.is_superuser
+
+
+# Returns the drinks with a word starting with ?q= from the in-process name index.
+# Apart from the session and the user, it doesn't touch the database. The results
+# may only be cached by the browser, as the catalog is only shown to users.
+@method_decorator(cache_control(private=True, max_age=60), name="dispatch")
+class DrinkTypeaheadView(LoginRequiredMixin, View):
+    raise_exception = True
+    limit = 8
+
+    def get(self, request, *args, **kwargs):
+        matches = drinkNames.search(request.GET.get("q", ""), self.limit)
+        return JsonResponse({
+            "results": [
+                { "id": pk, "text": name, "url": reverse("drink-detail", kwargs={"pk": pk}) }
+                for pk, name in matches
+            ]
+        })
+
+
 class DrinkCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = Drink
     fields = ["Name", "Type"]
@@ -157,13 +339,14 @@ class DrinkDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return context
 
 
-class IngredientListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class IngredientListView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     model = Ingredient
     template_name = "drinks/ingredients.html"
     context_object_name = 'ingredients'
     ordering = ['Name']
     paginate_by = 30
     filterset_class = IngredientFilter
+    search_parameter = "Name"
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -177,24 +360,45 @@ class IngredientListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['title'] = "List of Ingredients"
         context['form'] = self.ingredients.form
-        context['paginator'] = Paginator(self.ingredients.qs, self.paginate_by)
-        context['page_obj'] = context['paginator'].get_page(self.request.GET.get("page"))
         return context
 
 
 class IngredientDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
     model = Ingredient
     context_object_name = 'ingredient'
+    paginate_by = 30
+    cursor_kwarg = "cursor"
 
     def test_func(self):
         return self.request.user.is_superuser
     
+    # The drinks using the ingredient are read by cursor along the index on
+    # (Ingredient, Drink), so a page costs the same however many drinks use it.
+    # Their number is kept in UsageCount.
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = self.object
+        page = paginateByCursor(
+            Recipe.objects.filter(Ingredient=self.object).select_related("Drink"),
+            "Drink_id",
+            self.paginate_by,
+            self.request.GET.get(self.cursor_kwarg)
+        )
+        context['page_obj'] = page
+        context['is_paginated'] = page.has_other_pages()
         return context
 
 
+# Returns the ingredients with a word starting with ?q= from the in-process name index
+class IngredientAutocompleteView(LoginRequiredMixin, View):
+    raise_exception = True
+    limit = 10
+
+    def get(self, request, *args, **kwargs):
+        matches = ingredientNames.search(request.GET.get("q", ""), self.limit)
+        return JsonResponse({ "results": [{ "id": pk, "text": name } for pk, name in matches] })
+
+
 class IngredientCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = Ingredient
     fields =  ["Name", "Alcohol"]
@@ -221,18 +425,8 @@ class IngredientUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def form_valid(self, form):
         self.object = form.save(commit=False)
         self.object.save()
-        drinks = list(set([item.Drink for item in Recipe.objects.filter(Ingredient=self.object)]))
-        if self.object.Alcohol:
-            for drink in drinks:
-                drink.Alcohol = True
-                drink.save()
-        else:
-            for drink in drinks:
-                has_alcohol = any(
-                    [item.Ingredient.Alcohol for item in Recipe.objects.filter(Drink=drink)]
-                )
-                drink.Alcohol = has_alcohol
-                drink.save()
+        if "Alcohol" in form.changed_data:
+            recomputeAlcohol(getDrinksUsingIngredient(self.object))
         messages.success(self.request, f"Ingredient has been updated!")
         return redirect(self.get_success_url())
     
@@ -252,14 +446,14 @@ class IngredientDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
     def delete(self, request, *args, **kwargs):
         self.object = self.get_object()
-        drinks = list(set([item.Drink for item in Recipe.objects.filter(Ingredient=self.object)]))
-        self.object.delete()
-        for drink in drinks:
-            has_alcohol = any(
-                [item.Ingredient.Alcohol for item in Recipe.objects.filter(Drink=drink)]
-            )
-            drink.Alcohol = has_alcohol
-            drink.save()
+        with transaction.atomic():
+            # Only the drinks using an alcoholic ingredient can lose their Alcohol flag
+            if self.object.Alcohol:
+                recomputeAlcohol(
+                    getDrinksUsingIngredient(self.object),
+                    excluded_ingredient=self.object
+                )
+            self.object.delete()
         messages.success(self.request, f"Ingredient has been deleted!")
         return redirect(self.get_success_url())
 
@@ -272,13 +466,63 @@ class IngredientDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return context
 
 
+# Edits every line of the recipe of a drink at once
+class RecipeEditView(LoginRequiredMixin, UserPassesTestMixin, View):
+    template_name = "drinks/recipe_editor.html"
+
+    def test_func(self):
+        return self.request.user.is_superuser
+
+    def get_formset(self, drink, data=None):
+        return RecipeFormSet(
+            data,
+            instance=drink,
+            queryset=Recipe.objects.select_related("Ingredient").order_by("Ingredient")
+        )
+
+    def render(self, drink, formset):
+        return render(self.request, self.template_name, {
+            "title": "Edit Recipe",
+            "drink": drink,
+            "formset": formset,
+        })
+
+    def get(self, request, *args, **kwargs):
+        drink = get_object_or_404(Drink, pk=kwargs["drink_id"])
+        return self.render(drink, self.get_formset(drink))
+
+    # The drink stays locked until its recipe is saved, so concurrent editors take
+    # turns and its Alcohol always matches the last recipe saved
+    def post(self, request, *args, **kwargs):
+        with transaction.atomic():
+            drink = get_object_or_404(Drink.objects.select_for_update(), pk=kwargs["drink_id"])
+            formset = self.get_formset(drink, request.POST)
+            if formset.is_valid():
+                try:
+                    with transaction.atomic():
+                        saveRecipeFormset(formset)
+                except IntegrityError:
+                    # Items added by the per-line views aren't serialized by the lock
+                    formset.non_form_errors().append("The recipe changed while you were editing it.")
+                else:
+                    queueCatalogChange(drink.pk)
+                    messages.success(request, "Recipe has been saved!")
+                    return redirect("drink-detail", pk=drink.pk)
+        return self.render(drink, formset)
+
+
 class RecipeCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = Recipe
-    fields =  ["Ingredient", "Quantity", "Measurement"]
+    form_class = RecipeForm
+
+    def get_drink(self):
+        if not hasattr(self, "drink"):
+            self.drink = get_object_or_404(Drink, pk=self.kwargs['drink_id'])
+        return self.drink
     
     def form_valid(self, form):
         self.object = form.save(commit=False)
-        self.object.Drink = Drink.objects.get(pk=self.kwargs['drink_id'])
+        self.object.Drink = self.get_drink()
         self.object.save()
         if self.object.Ingredient.Alcohol:
             drink = self.object.Drink
@@ -293,22 +537,18 @@ class RecipeCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = "New Recipe"
-        context['drink'] = Drink.objects.get(pk=self.kwargs['drink_id'])
+        context['drink'] = self.get_drink()
         return context
 
 
 class RecipeUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
-    model = Recipe
-    fields =  ["Ingredient", "Quantity", "Measurement"]
+    queryset = Recipe.objects.select_related("Drink")
+    form_class = RecipeForm
 
     def form_valid(self, form):
         self.object = form.save(commit=False)
         self.object.save()
-        drink = self.object.Drink
-        drink.Alcohol = any(
-            [item.Ingredient.Alcohol for item in Recipe.objects.filter(Drink=drink)]
-        )
-        drink.save()
+        recomputeAlcohol(Drink.objects.filter(pk=self.object.Drink_id))
         messages.success(self.request, f"Recipe item has been updated!")
         return redirect(self.get_success_url())
 
@@ -318,24 +558,20 @@ class RecipeUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = "Update Recipe"
-        context['drink'] = Drink.objects.get(pk=self.kwargs['drink_id'])
+        context['drink'] = self.object.Drink
         return context
 
 
 class RecipeDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
-    model = Recipe
+    queryset = Recipe.objects.select_related("Drink", "Ingredient")
     context_object_name = 'recipe'
 
     def delete(self, request, *args, **kwargs):
         self.object = self.get_object()
-        drink = self.object.Drink
-        success_url = f"/drinks/{drink.pk}/"
+        drink_id = self.object.Drink_id
+        success_url = f"/drinks/{drink_id}/"
         self.object.delete()
-        has_alcohol = any(
-            [item.Ingredient.Alcohol for item in Recipe.objects.filter(Drink=drink)]
-        )
-        drink.Alcohol = has_alcohol
-        drink.save()
+        recomputeAlcohol(Drink.objects.filter(pk=drink_id))
         messages.success(self.request, f"Recipe item has been deleted!")
         return redirect(success_url)
 
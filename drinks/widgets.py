@@ -0,0 +1,50 @@
+from django.forms import Select, SelectMultiple
+from django.urls import reverse_lazy
+
+
+# Renders only the selected options of a model choice field. The others are
+# fetched from the autocomplete endpoint as the user types, so the page doesn't
+# grow with the number of rows. See drinks/static/drinks/autocomplete.js.
+# Rows already loaded can be given in `instances`, by pk, to render them without
+# a query.
+class AutocompleteMixin:
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        self.instances = {}
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs["data-autocomplete-url"] = str(self.url)
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [pk for pk in value if pk and str(pk).isdigit()]
+        options = []
+        if not self.allow_multiple_selected:
+            options.append(self.create_option(name, "", "---------", not selected, 0))
+        rows = [self.instances[str(pk)] for pk in selected if str(pk) in self.instances]
+        missing = [pk for pk in selected if str(pk) not in self.instances]
+        if missing:
+            rows += self.choices.queryset.filter(pk__in=missing)
+        for row in rows:
+            options.append(self.create_option(name, row.pk, str(row), True, len(options)))
+        return [(None, options, 0)]
+
+    class Media:
+        js = ["drinks/autocomplete.js"]
+
+
+class DrinkAutocompleteWidget(AutocompleteMixin, Select):
+    def __init__(self, attrs=None):
+        super().__init__(reverse_lazy("drinks-typeahead"), attrs)
+
+
+class IngredientAutocompleteWidget(AutocompleteMixin, Select):
+    def __init__(self, attrs=None):
+        super().__init__(reverse_lazy("ingredients-autocomplete"), attrs)
+
+
+class IngredientMultipleAutocompleteWidget(AutocompleteMixin, SelectMultiple):
+    def __init__(self, attrs=None):
+        super().__init__(reverse_lazy("ingredients-autocomplete"), attrs)
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import Profile
+from .models import Profile, OutboxEmail
 
 # Register your models here.
-admin.site.register(Profile)
\ No newline at end of file
+admin.site.register(Profile)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "created", "attempts", "next_attempt", "last_error")
+    readonly_fields = ("created",)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image
+from DrinkHub.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Widths and heights of the thumbnails made from every profile image
+THUMBNAIL_SIZES = (64, 128, 256)
+
+# Resizing runs on a small pool of background threads, outside the request
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "PROFILE_IMAGE_WORKERS", 2),
+    thread_name_prefix="profile-images"
+)
+
+
+def hashFile(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(64 * 1024), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+# Stores a newly uploaded image under the hash of its content. Uploads that are
+# already stored aren't written again, so identical images share one file.
+def storeImage(field_file):
+    extension = os.path.splitext(field_file.name)[1].lower()
+    name = field_file.field.generate_filename(
+        field_file.instance,
+        hashFile(field_file.file) + extension
+    )
+    if field_file.storage.exists(name):
+        field_file.name = name
+        field_file._committed = True
+    else:
+        field_file.save(os.path.basename(name), field_file.file, save=False)
+
+
+def getThumbnailName(name, size, extension=None):
+    root, original_extension = os.path.splitext(name)
+    return f"{root}_{size}{extension or original_extension}"
+
+
+# Writes every thumbnail size of the image in its own format and as WebP
+def makeThumbnails(storage, name):
+    with storage.open(name) as file:
+        original = Image.open(file)
+        original.load()
+    image_format = original.format or "PNG"
+
+    for size in THUMBNAIL_SIZES:
+        thumbnail = original.copy()
+        thumbnail.thumbnail((size, size))
+        for extension, thumbnail_format in [(None, image_format), (".webp", "WEBP")]:
+            thumbnail_name = getThumbnailName(name, size, extension)
+            if thumbnail_format == "JPEG" and thumbnail.mode not in ("RGB", "L"):
+                output = thumbnail.convert("RGB")
+            else:
+                output = thumbnail
+            buffer = BytesIO()
+            output.save(buffer, format=thumbnail_format)
+            if storage.exists(thumbnail_name):
+                storage.delete(thumbnail_name)
+            storage.save(thumbnail_name, ContentFile(buffer.getvalue()))
+
+
+# Makes the thumbnails of the image and flags the profiles using it. Returns
+# whether it succeeded.
+def processImage(storage, name):
+    from .models import Profile
+    try:
+        # Another profile with the same image may have made its thumbnails already
+        if not Profile.objects.filter(image=name, thumbnails=True).exists():
+            start = time.perf_counter()
+            makeThumbnails(storage, name)
+            metrics.observe(
+                "drinkhub_profile_image_seconds", time.perf_counter() - start, {"stage": "thumbnails"}
+            )
+        Profile.objects.filter(image=name).update(thumbnails=True)
+    except Exception:
+        logger.exception("Could not make the thumbnails of %s", name)
+        return False
+    return True
+
+
+# Runs on a background thread, which has its own database connection
+def processImageInBackground(storage, name):
+    try:
+        processImage(storage, name)
+    finally:
+        connections.close_all()
+
+
+# Queues the thumbnails of the image once the profile has been committed
+def scheduleThumbnails(field_file):
+    storage, name = field_file.storage, field_file.name
+    transaction.on_commit(lambda: executor.submit(processImageInBackground, storage, name))
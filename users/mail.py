@@ -0,0 +1,73 @@
+import base64
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from .models import OutboxEmail
+
+# Backend actually delivering the messages of the outbox
+DEFAULT_OUTBOX_EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+
+
+def getDeliveryConnection(**kwargs):
+    backend = getattr(settings, "OUTBOX_EMAIL_BACKEND", DEFAULT_OUTBOX_EMAIL_BACKEND)
+    return get_connection(backend, **kwargs)
+
+
+# Binary attachments are stored in base64, as the message is saved as JSON
+def serializeMessage(message):
+    attachments = []
+    for filename, content, mimetype in message.attachments:
+        if isinstance(content, bytes):
+            attachments.append([filename, base64.b64encode(content).decode(), mimetype, True])
+        else:
+            attachments.append([filename, content, mimetype, False])
+
+    return {
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "to": list(message.to),
+        "cc": list(message.cc),
+        "bcc": list(message.bcc),
+        "reply_to": list(message.reply_to),
+        "headers": message.extra_headers,
+        "alternatives": [list(alternative) for alternative in getattr(message, "alternatives", [])],
+        "attachments": attachments,
+    }
+
+
+def buildMessage(data, connection=None):
+    message = EmailMultiAlternatives(
+        subject=data["subject"],
+        body=data["body"],
+        from_email=data["from_email"],
+        to=data["to"],
+        cc=data["cc"],
+        bcc=data["bcc"],
+        reply_to=data["reply_to"],
+        headers=data["headers"],
+        alternatives=[tuple(alternative) for alternative in data["alternatives"]],
+        connection=connection,
+    )
+    for filename, content, mimetype, binary in data["attachments"]:
+        message.attach(filename, base64.b64decode(content) if binary else content, mimetype)
+    return message
+
+
+# Saves the messages to the outbox instead of sending them, so requests never wait
+# on the mail server. The drain_outbox command delivers them through the backend
+# set in OUTBOX_EMAIL_BACKEND. Only messages with attachments given as
+# (filename, content, mimetype) can be saved.
+class OutboxEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        outbox = [
+            OutboxEmail(message=serializeMessage(message))
+            for message in email_messages if message.recipients()
+        ]
+        try:
+            OutboxEmail.objects.bulk_create(outbox)
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+        return len(outbox)
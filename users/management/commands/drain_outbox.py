@@ -0,0 +1,101 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from users.mail import buildMessage, getDeliveryConnection
+from users.models import OutboxEmail
+
+
+# Delivers the emails of the outbox in batches over a single connection to the
+# mail server. Every batch is locked with SKIP LOCKED, so several workers can
+# drain the outbox at once without sending a message twice. A message that fails
+# is retried after a delay doubling with every attempt, up to --max-attempts.
+class Command(BaseCommand):
+    help = "Delivers the emails waiting in the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of emails per batch.")
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=8,
+            help="Number of times an email is tried before it's left in the outbox."
+        )
+        parser.add_argument(
+            "--backoff",
+            type=float,
+            default=60,
+            help="Seconds before an email that failed once is retried."
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep waiting for new emails instead of stopping once the outbox is empty."
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between checks of an empty outbox with --loop."
+        )
+
+    def handle(self, *args, **options):
+        self.max_attempts = options["max_attempts"]
+        self.backoff = options["backoff"]
+        connection = getDeliveryConnection()
+        sent = failed = 0
+        try:
+            while True:
+                batch_sent, batch_failed = self.drainBatch(connection, options["batch_size"])
+                sent += batch_sent
+                failed += batch_failed
+                if batch_sent or batch_failed:
+                    continue
+                if not options["loop"]:
+                    break
+                # Don't hold the connection to the mail server while idle
+                connection.close()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} emails, {failed} failed."))
+
+    def drainBatch(self, connection, batch_size):
+        with transaction.atomic():
+            emails = list(
+                OutboxEmail.objects.select_for_update(skip_locked=True).filter(
+                    next_attempt__lte=timezone.now(),
+                    attempts__lt=self.max_attempts
+                )[:batch_size]
+            )
+            if not emails:
+                return 0, 0
+
+            delivered = []
+            failed = []
+            for email in emails:
+                try:
+                    connection.open()
+                    buildMessage(email.message, connection).send()
+                except Exception as error:
+                    # A broken connection is opened again for the next email
+                    connection.close()
+                    email.attempts += 1
+                    email.next_attempt = timezone.now() + timedelta(
+                        seconds=self.backoff * 2 ** (email.attempts - 1)
+                    )
+                    email.last_error = f"{type(error).__name__}: {error}"
+                    failed.append(email)
+                else:
+                    delivered.append(email.pk)
+
+            OutboxEmail.objects.filter(pk__in=delivered).delete()
+            OutboxEmail.objects.bulk_update(failed, ["attempts", "next_attempt", "last_error"])
+
+        for email in failed:
+            self.stderr.write(f"{email}: {email.last_error}")
+        return len(delivered), len(failed)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from users.images import processImage
+from users.models import DEFAULT_IMAGE, Profile
+
+
+# Makes the thumbnails of the profile images that don't have them yet, such as
+# the ones uploaded before thumbnails existed. Profiles sharing an image are
+# handled once. It can be run again, as images with thumbnails are skipped.
+class Command(BaseCommand):
+    help = "Makes the missing thumbnails of the profile images."
+
+    def handle(self, *args, **options):
+        names = (
+            Profile.objects.filter(thumbnails=False)
+            .exclude(image__in=["", DEFAULT_IMAGE])
+            .order_by("image")
+            .values_list("image", flat=True)
+            .distinct()
+        )
+        storage = Profile._meta.get_field("image").storage
+        made = failed = 0
+        for name in names.iterator():
+            if processImage(storage, name):
+                made += 1
+            else:
+                failed += 1
+                self.stderr.write(f"Could not make the thumbnails of {name}")
+
+        self.stdout.write(self.style.SUCCESS(f"Made the thumbnails of {made} images, {failed} failed."))
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20201009_2142'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='thumbnails',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
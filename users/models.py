@@ -1,21 +1,61 @@
+import time
 from django.db import models
 from django.contrib.auth.models import User
-from PIL import Image
+from django.utils import timezone
+from DrinkHub.metrics import metrics
+from .images import storeImage, scheduleThumbnails, getThumbnailName, THUMBNAIL_SIZES
+
+DEFAULT_IMAGE = "default.jpg"
 
 # Create your models here.
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    image = models.ImageField(default="default.jpg", upload_to="profile_pics")
+    image = models.ImageField(default=DEFAULT_IMAGE, upload_to="profile_pics")
+    thumbnails = models.BooleanField(default=False, editable=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._saved_image = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "image" in instance.__dict__:
+            instance._saved_image = instance.image.name
+        return instance
+
+    # Whether the image differs from the one last saved in the database.
+    # An image that was deferred and never loaded can't have been changed.
+    def imageChanged(self):
+        if "image" not in self.__dict__:
+            return False
+        return self.image.name != self._saved_image
 
     def save(self, *args, **kwargs):
+        # The default image is shared by every user, so it has no thumbnails
+        resize = self.imageChanged() and self.image.name != DEFAULT_IMAGE
+        if resize:
+            if not self.image._committed:
+                start = time.perf_counter()
+                storeImage(self.image)
+                metrics.observe(
+                    "drinkhub_profile_image_seconds", time.perf_counter() - start, {"stage": "store"}
+                )
+            self.thumbnails = False
+
         super().save(*args, **kwargs)
+        self._saved_image = self.image.name
 
-        img = Image.open(self.image.path)
+        if resize:
+            scheduleThumbnails(self.image)
 
-        if img.width > 300 or img.height > 300:
-            output_size = (300, 300)
-            img.thumbnail(output_size)
-            img.save(self.image.path)
+    # Returns the URL of the smallest thumbnail at least `size` pixels wide, or of
+    # the original image until the thumbnails have been made
+    def getImageUrl(self, size=None, extension=None):
+        if not self.thumbnails or size is None:
+            return self.image.url
+        size = next((s for s in THUMBNAIL_SIZES if s >= size), THUMBNAIL_SIZES[-1])
+        return self.image.storage.url(getThumbnailName(self.image.name, size, extension))
     
     def __str__(self):
         return f'{self.user.username}'
@@ -23,3 +63,19 @@ class Profile(models.Model):
     class Meta:
         ordering = ['user']
 
+
+
+# An email waiting to be delivered by the drain_outbox command. Messages that
+# are delivered are deleted, those that fail are retried later with backoff.
+class OutboxEmail(models.Model):
+    message = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.message.get("subject", "")
+
+    class Meta:
+        ordering = ['next_attempt', 'id']
@@ -8,6 +8,11 @@ def createProfile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
+# Saves the profile along with the user only if it was loaded and changed.
+# Saving a user without touching the profile (e.g. on login) costs no extra queries.
 @receiver(post_save, sender=User)
-def saveProfile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+def saveProfile(sender, instance, created, **kwargs):
+    if created or not User.profile.related.is_cached(instance):
+        return
+    if instance.profile.imageChanged():
+        instance.profile.save()
@@ -0,0 +1,16 @@
+from django import template
+
+register = template.Library()
+
+# Renders a profile image at the given display size. Browsers pick the smallest
+# thumbnail that fits the screen's pixel density, in WebP when they support it.
+@register.inclusion_tag("users/profile_image.html")
+def profile_image(profile, size):
+    context = {
+        "url": profile.getImageUrl(size),
+        "url_2x": profile.getImageUrl(size * 2),
+    }
+    if profile.thumbnails:
+        context["webp_url"] = profile.getImageUrl(size, ".webp")
+        context["webp_url_2x"] = profile.getImageUrl(size * 2, ".webp")
+    return context
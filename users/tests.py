@@ -1,3 +1,223 @@
-from django.test import TestCase
+import base64
+import hashlib
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from DrinkHub.testing import QueryBudgetTestCase
+from PIL import Image
+from .images import THUMBNAIL_SIZES, processImage
+from .models import OutboxEmail, Profile
 
-# Create your tests here.
+# Several pages of users, so a query per row can't go unnoticed
+NUMBER_OF_USERS = 100
+
+
+class UserQueryBudgetTestCase(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([
+            User(username=f"user{i:03}", email=f"user{i:03}@example.com")
+            for i in range(NUMBER_OF_USERS)
+        ])
+        Profile.objects.bulk_create([Profile(user=user) for user in User.objects.all()])
+        cls.user = User.objects.get(username="user000")
+        cls.superuser = User.objects.create_superuser("admin", "admin@example.com", "password")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.superuser)
+
+    def test_user_list(self):
+        response = self.assertQueryBudget(3, reverse("users-list"))
+        self.assertQueryBudget(3, reverse("users-list"), {"cursor": response.context["page_obj"].next_cursor})
+
+    def test_tampered_cursor(self):
+        first_page = list(self.client.get(reverse("users-list")).context["page_obj"])
+        for data in [f'[["user050",{2 ** 70}],"next"]', '[[5,"x"],"next"]', '[null,"sideways"]']:
+            cursor = base64.urlsafe_b64encode(data.encode()).decode()
+            response = self.client.get(reverse("users-list"), {"cursor": cursor})
+            self.assertEqual(list(response.context["page_obj"]), first_page)
+
+    def test_user_detail(self):
+        self.assertQueryBudget(3, reverse("user-detail", args=[self.user.pk]))
+
+    def test_user_delete(self):
+        self.assertQueryBudget(3, reverse("user-delete", args=[self.user.pk]))
+
+    def test_profile(self):
+        self.assertQueryBudget(3, reverse("profile"))
+
+
+@override_settings(
+    EMAIL_BACKEND="users.mail.OutboxEmailBackend",
+    OUTBOX_EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+)
+class OutboxTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user("user", "user@example.com", "password")
+
+    def resetPassword(self):
+        response = self.client.post(reverse("password_reset"), {"email": "user@example.com"})
+        self.assertEqual(response.status_code, 302)
+
+    def test_password_reset_is_queued(self):
+        self.resetPassword()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+        call_command("drain_outbox", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["user@example.com"])
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_failed_email_is_retried_later(self):
+        self.resetPassword()
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError):
+            call_command("drain_outbox", stdout=StringIO(), stderr=StringIO())
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("OSError", email.last_error)
+
+        # The email isn't due again until the backoff is over
+        call_command("drain_outbox", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+        OutboxEmail.objects.update(next_attempt=email.created)
+        call_command("drain_outbox", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class ProfileImageTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("user", "user@example.com", "password")
+
+    def test_image_changed(self):
+        profile = Profile.objects.get(user=self.user)
+        self.assertFalse(profile.imageChanged())
+        profile.image = "profile_pics/user.jpg"
+        self.assertTrue(profile.imageChanged())
+        with mock.patch("users.models.scheduleThumbnails") as scheduleThumbnails:
+            profile.save()
+        scheduleThumbnails.assert_called_once_with(profile.image)
+        self.assertFalse(profile.imageChanged())
+
+    def test_deferred_image(self):
+        profile = Profile.objects.defer("image").get(user=self.user)
+        self.assertFalse(profile.imageChanged())
+
+    # Saving the user, e.g. on login, doesn't save a profile that didn't change
+    def test_user_save(self):
+        user = User.objects.select_related("profile").get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            user.save()
+
+        user.profile.image = "profile_pics/user.jpg"
+        with mock.patch("users.models.scheduleThumbnails"), self.assertNumQueries(2):
+            user.save()
+        self.assertEqual(Profile.objects.get(user=self.user).image.name, "profile_pics/user.jpg")
+
+
+def makeImage(name, color, size=(400, 300), format="PNG"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ProfileThumbnailTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("user", "user@example.com", "password")
+        cls.other = User.objects.create_user("other", "other@example.com", "password")
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.media_root = directory.name
+
+    def upload(self, user, image):
+        profile = Profile.objects.get(user=user)
+        profile.image = image
+        with mock.patch("users.models.scheduleThumbnails") as scheduleThumbnails:
+            profile.save()
+        scheduleThumbnails.assert_called_once_with(profile.image)
+        return profile
+
+    # Identical uploads are stored once, under the hash of their content
+    def test_content_hash_naming(self):
+        image = makeImage("avatar.PNG", "red")
+        digest = hashlib.sha256(image.read()).hexdigest()
+        image.seek(0)
+        profile = self.upload(self.user, image)
+        self.assertEqual(profile.image.name, f"profile_pics/{digest}.png")
+
+        other_profile = self.upload(self.other, makeImage("copy.png", "red"))
+        self.assertEqual(other_profile.image.name, profile.image.name)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "profile_pics")), [f"{digest}.png"])
+
+        third_profile = self.upload(self.other, makeImage("avatar.png", "blue"))
+        self.assertNotEqual(third_profile.image.name, profile.image.name)
+
+    def test_thumbnails(self):
+        profile = self.upload(self.user, makeImage("avatar.jpg", "red", format="JPEG"))
+        self.upload(self.other, makeImage("avatar.jpg", "red", format="JPEG"))
+        self.assertTrue(processImage(profile.image.storage, profile.image.name))
+
+        root = os.path.splitext(profile.image.path)[0]
+        for size in THUMBNAIL_SIZES:
+            for extension, image_format in [(".jpg", "JPEG"), (".webp", "WEBP")]:
+                with Image.open(f"{root}_{size}{extension}") as thumbnail:
+                    self.assertEqual((thumbnail.format, thumbnail.size), (image_format, (size, size * 3 // 4)))
+        self.assertEqual(Profile.objects.filter(thumbnails=True).count(), 2)
+
+        profile.refresh_from_db()
+        name = os.path.splitext(profile.image.name)[0]
+        self.assertEqual(profile.getImageUrl(100), f"/media/{name}_128.jpg")
+        self.assertEqual(profile.getImageUrl(100, ".webp"), f"/media/{name}_128.webp")
+        self.assertEqual(profile.getImageUrl(1000), f"/media/{name}_256.jpg")
+        html = Template("{% load users_extras %}{% profile_image profile 64 %}").render(Context({"profile": profile}))
+        self.assertIn(f'srcset="/media/{name}_64.webp 1x, /media/{name}_128.webp 2x"', html)
+
+    # Until the thumbnails are made, the original is shown
+    def test_fallback_to_original(self):
+        profile = self.upload(self.user, makeImage("avatar.png", "red"))
+        html = Template("{% load users_extras %}{% profile_image profile 64 %}").render(Context({"profile": profile}))
+        self.assertNotIn("webp", html)
+        self.assertIn(f'src="{profile.image.url}"', html)
+
+        with open(profile.image.path, "wb") as file:
+            file.write(b"not an image")
+        with self.assertLogs("users.images", "ERROR"):
+            self.assertFalse(processImage(profile.image.storage, profile.image.name))
+        profile.refresh_from_db()
+        self.assertFalse(profile.thumbnails)
+        self.assertEqual(profile.getImageUrl(64), profile.image.url)
+
+    # Images uploaded before thumbnails existed are caught up, the default one is left alone
+    def test_backfill(self):
+        profile = self.upload(self.user, makeImage("avatar.png", "red"))
+        missing = self.upload(self.other, makeImage("avatar.png", "blue"))
+        os.remove(missing.image.path)
+        User.objects.create_user("new", "new@example.com", "password")
+
+        output = StringIO()
+        with self.assertLogs("users.images", "ERROR"):
+            call_command("make_thumbnails", stdout=output, stderr=StringIO())
+        self.assertIn("Made the thumbnails of 1 images, 1 failed.", output.getvalue())
+        self.assertEqual(
+            set(Profile.objects.filter(thumbnails=True).values_list("image", flat=True)), {profile.image.name}
+        )
+        self.assertTrue(os.path.exists(os.path.splitext(profile.image.path)[0] + "_64.webp"))
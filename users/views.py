@@ -17,7 +17,7 @@ from .forms import UserRegisterForm, UserUpdateForm, ProfileUpdateForm
 from django.views.generic import ListView, DetailView, DeleteView
 from .models import User
 from .filters import UserFilter
-from django.core.paginator import Paginator
+from drinks.pagination import KeysetPaginationMixin
 
 # Create your views here.
 def register(request):
@@ -52,16 +52,17 @@ def profile(request):
     return render(request, "users/profile.html", context)
 
 
-class UserListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class UserListView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     model = User
     template_name = "users/users.html"
     context_object_name = 'user_profiles'
     ordering = ['username']
+    cursor_field = "username"
     paginate_by = 30
     filterset_class = UserFilter
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related("profile")
         self.user_profiles = self.filterset_class(self.request.GET, queryset=queryset)
         return self.user_profiles.qs.distinct()
 
@@ -72,13 +73,11 @@ class UserListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['title'] = "List of Users"
         context['form'] = self.user_profiles.form
-        context['paginator'] = Paginator(self.user_profiles.qs, self.paginate_by)
-        context['page_obj'] = context['paginator'].get_page(self.request.GET.get("page"))
         return context
 
 
 class UserDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
-    model = User
+    queryset = User.objects.select_related("profile")
     template_name = "users/user_detail.html"
     context_object_name = 'user_profile'
 
@@ -109,12 +108,12 @@ class UserDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
             return redirect(self.get_success_url())
     
     def test_func(self):
-        return self.request.user.id == self.get_object().id or self.request.user.is_superuser
+        return self.request.user.id == self.kwargs["pk"] or self.request.user.is_superuser
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = "Delete User"
-        context['user_id'] = self.get_object().id
+        context['user_id'] = self.object.id
         return context
 
 